@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import httpx
+import strawberry
+
+import oceny_graphql
+from zapytania_utrwalone import skrot_zapytania
+
+LICZBA_ZAPYTAN = 2000
+
+ZAPYTANIE = """
+query StudenciZOcenami {
+  studenci {
+    id
+    imie
+    nazwisko
+    kierunek
+    oceny { id ocena komentarz przedmiot { nazwa prowadzacy } }
+  }
+  ocenyStudenta(studentId: 1) { id ocena data }
+}
+"""
+
+# ten sam schemat bez rozszerzeń: każde zapytanie jest parsowane i walidowane od nowa
+schemat_bez_cache = strawberry.Schema(query=oceny_graphql.Query, mutation=oceny_graphql.Mutation)
+
+
+def tresc(tylko_skrot: bool) -> dict:
+    utrwalone = {"persistedQuery": {"version": 1, "sha256Hash": skrot_zapytania(ZAPYTANIE)}}
+    if tylko_skrot:
+        return {"extensions": utrwalone}
+    return {"query": ZAPYTANIE, "extensions": utrwalone}
+
+
+async def zmierz_schemat(nazwa, schemat, **argumenty):
+    # pierwsze wykonanie z pełnym tekstem rejestruje zapytanie utrwalone
+    await schemat.execute(context_value=oceny_graphql.kontekst(), **{**argumenty, "query": ZAPYTANIE})
+    start = time.perf_counter()
+    for _ in range(LICZBA_ZAPYTAN):
+        wynik = await schemat.execute(context_value=oceny_graphql.kontekst(), **argumenty)
+        assert wynik.errors is None, wynik.errors
+    czas = (time.perf_counter() - start) / LICZBA_ZAPYTAN
+    print(f"{nazwa:45s} {czas * 1e6:8.0f} µs/zapytanie")
+    return czas
+
+
+async def zmierz_http(nazwa, app, json):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as klient:
+        await klient.post("/graphql", json=tresc(False) if "extensions" in json else json)
+        start = time.perf_counter()
+        for _ in range(LICZBA_ZAPYTAN):
+            odpowiedz = await klient.post("/graphql", json=json)
+            assert "errors" not in odpowiedz.json(), odpowiedz.text
+        czas = (time.perf_counter() - start) / LICZBA_ZAPYTAN
+    print(f"{nazwa:45s} {czas * 1e6:8.0f} µs/zapytanie")
+    return czas
+
+
+async def main():
+    print(f"BENCHMARK ZAPYTAŃ GRAPHQL ({LICZBA_ZAPYTAN} powtórzeń, {len(ZAPYTANIE)} znaków)")
+    print("\nschemat.execute:")
+    bez = await zmierz_schemat("bez cache (parsowanie + walidacja)", schemat_bez_cache, query=ZAPYTANIE)
+    await zmierz_schemat("ParserCache + ValidationCache, pełny tekst", oceny_graphql.schemat, query=ZAPYTANIE)
+    skrot = await zmierz_schemat("zapytanie utrwalone (sam skrót)", oceny_graphql.schemat,
+                                 query=None, operation_extensions=tresc(True)["extensions"])
+    print(f"oszczędność na zapytaniu: {(bez - skrot) * 1e6:.0f} µs ({(1 - skrot / bez) * 100:.0f}%)")
+
+    print("\nstrawberry.asgi.GraphQL (HTTP w pamięci, bez sieci):")
+    bez = await zmierz_http("bez cache, pełny tekst", oceny_graphql.GraphQLOceny(schemat_bez_cache), {"query": ZAPYTANIE})
+    await zmierz_http("z cache, pełny tekst", oceny_graphql.app, {"query": ZAPYTANIE})
+    skrot = await zmierz_http("zapytanie utrwalone (sam skrót)", oceny_graphql.app, tresc(True))
+    print(f"oszczędność na żądaniu: {(bez - skrot) * 1e6:.0f} µs ({(1 - skrot / bez) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+import precyzja
+import wyrazenia
+from kalkulator_rest import app, oblicz
+
+klient = TestClient(app)
+
+def zmierz(nazwa, funkcja, liczba_operacji):
+    """Uruchom funkcję i wypisz ile operacji na sekundę udało się wykonać"""
+    start = time.perf_counter()
+    funkcja()
+    czas = time.perf_counter() - start
+    print(f"{nazwa:40s} {liczba_operacji / czas:12.0f} operacji/s  ({czas:.3f} s)")
+
+def pojedyncze(n):
+    for i in range(n):
+        klient.get(f"/dodaj/{i}/2")
+
+def batch_json(n):
+    elementy = [{"op": "dodaj", "a": i, "b": 2} for i in range(n)]
+    klient.post("/batch", json=elementy)
+
+def batch_ndjson(n):
+    tresc = "\n".join(json.dumps({"op": "dodaj", "a": i, "b": 2}) for i in range(n))
+    klient.post("/batch", content=tresc, headers={"Content-Type": "application/x-ndjson"})
+
+def funkcje_float(n):
+    for i in range(n):
+        oblicz("podziel", float(i), 7.0)
+
+def funkcje_dokladne(n, tryb):
+    for i in range(n):
+        precyzja.oblicz_dokladnie("podziel", str(i), "7", tryb)
+
+def wyrazenie(n, tryb):
+    for _ in range(n):
+        wyrazenia.policz("(10.5+2.25)*3/7", tryb)
+
+def trasy(n, prefiks):
+    for i in range(n):
+        klient.get(f"{prefiks}/{i}/7")
+
+if __name__ == "__main__":
+    N = 2000
+    print(f"BENCHMARK KALKULATORA REST ({N} operacji)")
+    zmierz("GET /dodaj/{a}/{b} (pojedynczo)", lambda: pojedyncze(N), N)
+    zmierz("POST /batch (JSON)", lambda: batch_json(N), N)
+    zmierz("POST /batch (NDJSON)", lambda: batch_ndjson(N), N)
+
+    print(f"\nTRYBY DOKŁADNE ({N * 50} wywołań funkcji, {N} zapytań HTTP)")
+    zmierz("oblicz() float", lambda: funkcje_float(N * 50), N * 50)
+    zmierz("oblicz_dokladnie() decimal", lambda: funkcje_dokladne(N * 50, "decimal"), N * 50)
+    zmierz("oblicz_dokladnie() ulamek", lambda: funkcje_dokladne(N * 50, "ulamek"), N * 50)
+    zmierz("wyrazenia.policz() float", lambda: wyrazenie(N * 50, "float"), N * 50)
+    zmierz("wyrazenia.policz() decimal", lambda: wyrazenie(N * 50, "decimal"), N * 50)
+    zmierz("GET /podziel/{a}/{b}", lambda: trasy(N, "/podziel"), N)
+    zmierz("GET /dec/podziel/{a}/{b}", lambda: trasy(N, "/dec/podziel"), N)
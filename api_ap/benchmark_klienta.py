@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+import requests
+
+from klient_kalkulatora import AsyncKlientKalkulatora, KlientKalkulatora
+from obciazenie_kalkulatora import HOST, PORT, uruchom_serwer
+
+LICZBA_ZAPYTAN = 2000
+BASE_URL = f"http://{HOST}:{PORT}"
+
+
+def zmierz(nazwa, funkcja):
+    start = time.perf_counter()
+    wyniki = funkcja()
+    czas = time.perf_counter() - start
+    assert all("wynik" in w for w in wyniki), "serwer zwrócił błąd"
+    print(f"{nazwa:45s} {LICZBA_ZAPYTAN / czas:8.0f} zapytań/s")
+
+
+def bez_sesji(pary):
+    """Tak jak IneraktywnyKalkulator: nowe połączenie TCP dla każdego zapytania"""
+    return [requests.get(f"{BASE_URL}/dodaj/{a}/{b}").json() for a, b in pary]
+
+
+async def async_map(pary, concurrency):
+    async with AsyncKlientKalkulatora(BASE_URL) as klient:
+        return await klient.map("dodaj", pary, concurrency=concurrency)
+
+
+if __name__ == "__main__":
+    pary = [(i, 1) for i in range(LICZBA_ZAPYTAN)]
+    print(f"BENCHMARK KLIENTA KALKULATORA ({LICZBA_ZAPYTAN} zapytań)")
+    serwer = uruchom_serwer("1")
+    try:
+        zmierz("requests.get bez sesji", lambda: bez_sesji(pary))
+        with KlientKalkulatora(BASE_URL) as klient:
+            for concurrency in (1, 8, 64):
+                zmierz(f"KlientKalkulatora.map concurrency={concurrency}",
+                       lambda: klient.map("dodaj", pary, concurrency=concurrency))
+        for concurrency in (1, 8, 64):
+            zmierz(f"AsyncKlientKalkulatora.map concurrency={concurrency}",
+                   lambda: asyncio.run(async_map(pary, concurrency)))
+    finally:
+        serwer.terminate()
+        serwer.wait()
@@ -0,0 +1,37 @@
+import os
+import random
+import tempfile
+import time
+
+from repozytorium_sqlite import RepozytoriumSQLite
+from repozytorium_zadan import RepozytoriumZadan
+
+LICZBA_ZADAN = 100_000
+LICZBA_ODCZYTOW = 20_000
+
+
+def zmierz(nazwa, funkcja, liczba):
+    start = time.perf_counter()
+    funkcja()
+    czas = time.perf_counter() - start
+    print(f"  {nazwa:30s} {liczba / czas:12.0f} operacji/s")
+
+
+def uruchom(nazwa, repozytorium):
+    print(nazwa)
+    zmierz("dodaj() pojedynczo", lambda: [repozytorium.dodaj(f"Zadanie {i}", "Opis") for i in range(10_000)], 10_000)
+    zmierz("dodaj_wiele()", lambda: repozytorium.dodaj_wiele((f"Zadanie {i}", "Opis", False) for i in range(LICZBA_ZADAN)),
+           LICZBA_ZADAN)
+    ids = [random.randint(1, LICZBA_ZADAN) for _ in range(LICZBA_ODCZYTOW)]
+    zmierz("pobierz()", lambda: [repozytorium.pobierz(i) for i in ids], LICZBA_ODCZYTOW)
+    zmierz("oznacz_zrobione()", lambda: [repozytorium.oznacz_zrobione(i) for i in ids[:5000]], 5000)
+    zmierz("strona(po_id, 100)", lambda: [repozytorium.strona(i, 100) for i in ids[:2000]], 2000)
+    zmierz("filtruj(True)", lambda: [repozytorium.filtruj(True) for _ in range(20)], 20)
+    zmierz("usun()", lambda: [repozytorium.usun(i) for i in ids[:5000]], 5000)
+
+
+if __name__ == "__main__":
+    print(f"BENCHMARK MAGAZYNÓW ZADAŃ ({LICZBA_ZADAN} zadań)")
+    uruchom("RepozytoriumZadan (pamięć)", RepozytoriumZadan())
+    with tempfile.TemporaryDirectory() as katalog:
+        uruchom("RepozytoriumSQLite (WAL)", RepozytoriumSQLite(os.path.join(katalog, "zadania.db")))
@@ -0,0 +1,45 @@
+import gc
+import json
+import time
+import tracemalloc
+
+from repozytorium_zadan import Zadanie
+
+LICZBA_ZADAN = 1_000_000
+
+
+class ZadanieZwykle:
+    """Poprzednia wersja klasy Zadanie: zwykłe atrybuty w __dict__"""
+    def __init__(self, id: int, tytul: str, opis: str, zrobione: bool = False):
+        self.id = id
+        self.tytul = tytul
+        self.opis = opis
+        self.zrobione = zrobione
+
+
+def zmierz_pamiec(nazwa, klasa):
+    gc.collect()
+    tracemalloc.start()
+    # tytuły składane w locie, jak z zapytań HTTP, więc bez wspólnych obiektów str
+    zadania = [klasa(i, "Zadanie " + str(i % 100), "Opis zadania", False) for i in range(LICZBA_ZADAN)]
+    zajete, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{nazwa:35s} {zajete / 1024 / 1024:8.1f} MB  ({zajete / LICZBA_ZADAN:.0f} B na zadanie)")
+    return zadania
+
+
+def zmierz_serializacje(nazwa, zadania, funkcja):
+    start = time.perf_counter()
+    for zadanie in zadania:
+        funkcja(zadanie)
+    print(f"{nazwa:35s} {len(zadania) / (time.perf_counter() - start):10.0f} zadań/s")
+
+
+if __name__ == "__main__":
+    print(f"BENCHMARK PAMIĘCI ZADAŃ ({LICZBA_ZADAN} zadań)")
+    zwykle = zmierz_pamiec("ZadanieZwykle (__dict__)", ZadanieZwykle)
+    zmierz_serializacje("json.dumps(vars(zadanie))", zwykle, lambda z: json.dumps(vars(z)))
+    del zwykle
+    slotowe = zmierz_pamiec("Zadanie (__slots__, intern)", Zadanie)
+    zmierz_serializacje("json.dumps(zadanie.jako_slownik())", slotowe, lambda z: json.dumps(z.jako_slownik()))
+    zmierz_serializacje("zadanie.jako_json()", slotowe, Zadanie.jako_json)
@@ -0,0 +1,203 @@
+import atexit
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+
+from historia_operacji import formatuj_wpis
+
+PREFIKS = "historia-"
+ROZSZERZENIE = ".jsonl"
+MAKS_OCZEKUJACYCH = 1_000_000
+
+logger = logging.getLogger(__name__)
+
+
+def _ostatnie_linie(sciezka: str, limit: int) -> list:
+    """Ostatnie `limit` pełnych linii pliku, od najnowszej.
+
+    Plik jest mapowany w pamięć i czytany od końca, więc koszt zależy
+    od liczby zwróconych linii, a nie od rozmiaru pliku.
+    """
+    with open(sciezka, "rb") as plik:
+        rozmiar = os.fstat(plik.fileno()).st_size
+        if rozmiar == 0 or limit <= 0:
+            return []
+        with mmap.mmap(plik.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            # niedokończony ostatni wpis (zapis innego procesu w toku) pomijamy
+            koniec = mapa.rfind(b"\n")
+            linie = []
+            while koniec > 0 and len(linie) < limit:
+                start = mapa.rfind(b"\n", 0, koniec) + 1
+                linie.append(mapa[start:koniec])
+                koniec = start - 1
+            return linie
+
+
+class DziennikHistorii:
+    """Historia zapisywana do plików JSONL, wspólna dla wszystkich workerów.
+
+    Wpisy trafiają najpierw do bufora w pamięci, a wątek w tle co
+    `interwal_zapisu` sekund dopisuje je na koniec pliku i robi fsync.
+    Po przekroczeniu `maks_rozmiar_segmentu` zaczynany jest nowy plik,
+    a najstarsze ponad `maks_segmentow` są usuwane.
+
+    Gdy zapis się nie uda (pełny dysk, brak uprawnień), wpisy wracają do
+    bufora, a wątek próbuje dalej; błąd jest logowany i dostępny w
+    `ostatni_blad`. Przy długiej awarii bufor trzyma najwyżej
+    `maks_oczekujacych` najnowszych wpisów.
+    """
+
+    def __init__(self, katalog: str, maks_rozmiar_segmentu: int = 64 * 1024 * 1024,
+                 maks_segmentow: int = 8, interwal_zapisu: float = 1.0,
+                 maks_oczekujacych: int = MAKS_OCZEKUJACYCH):
+        self.katalog = katalog
+        self.maks_rozmiar_segmentu = maks_rozmiar_segmentu
+        self.maks_segmentow = maks_segmentow
+        self.interwal_zapisu = interwal_zapisu
+        self.maks_oczekujacych = maks_oczekujacych
+        self.ostatni_blad = None
+        os.makedirs(katalog, exist_ok=True)
+
+        self._oczekujace = []
+        self._blokada = threading.Lock()
+        self._blokada_pliku = threading.Lock()
+        self._blokada_licznika = threading.Lock()
+        self._numer = max(self._numery_segmentow(), default=1)
+        # numer segmentu -> (policzone bajty, policzone linie), uzupełniane przy len()
+        self._policzone = {}
+
+        self._stop = threading.Event()
+        self._watek = threading.Thread(target=self._zapisuj_w_tle, daemon=True)
+        self._watek.start()
+        atexit.register(self.zamknij)
+
+    def _sciezka(self, numer: int) -> str:
+        return os.path.join(self.katalog, f"{PREFIKS}{numer:06d}{ROZSZERZENIE}")
+
+    def _numery_segmentow(self) -> list:
+        numery = []
+        for nazwa in os.listdir(self.katalog):
+            if nazwa.startswith(PREFIKS) and nazwa.endswith(ROZSZERZENIE):
+                numery.append(int(nazwa[len(PREFIKS):-len(ROZSZERZENIE)]))
+        return sorted(numery)
+
+    def _policz_linie(self, numer: int) -> int:
+        """Linie segmentu; czytane są tylko bajty dopisane od poprzedniego liczenia"""
+        przesuniecie, linie = self._policzone.get(numer, (0, 0))
+        with open(self._sciezka(numer), "rb") as plik:
+            plik.seek(przesuniecie)
+            for blok in iter(lambda: plik.read(1 << 20), b""):
+                przesuniecie += len(blok)
+                linie += blok.count(b"\n")
+        self._policzone[numer] = (przesuniecie, linie)
+        return linie
+
+    def dodaj(self, operacja: str):
+        linia = json.dumps({"czas": time.time_ns(), "operacja": operacja}, ensure_ascii=False)
+        with self._blokada:
+            self._oczekujace.append(linia)
+
+    def __len__(self):
+        """Wpisy w plikach (wszystkich workerów) i w buforze tego procesu"""
+        with self._blokada_licznika:
+            numery = self._numery_segmentow()
+            liczba = 0
+            for numer in numery:
+                try:
+                    liczba += self._policz_linie(numer)
+                except FileNotFoundError:
+                    self._policzone.pop(numer, None)
+            for numer in self._policzone.keys() - set(numery):
+                del self._policzone[numer]
+        with self._blokada:
+            return liczba + len(self._oczekujace)
+
+    def zapisz(self):
+        """Dopisz oczekujące wpisy do aktywnego segmentu i wymuś fsync"""
+        with self._blokada:
+            wpisy, self._oczekujace = self._oczekujace, []
+        if not wpisy:
+            return
+        try:
+            self._dopisz(wpisy)
+        except Exception:
+            with self._blokada:
+                # wpisy wracają przed nowsze; przy długiej awarii najstarsze przepadają
+                self._oczekujace[:0] = wpisy
+                del self._oczekujace[:-self.maks_oczekujacych]
+            raise
+
+    def _dopisz(self, wpisy: list):
+        dane = ("\n".join(wpisy) + "\n").encode("utf-8")
+        with self._blokada_pliku:
+            # inny worker mógł już zacząć nowy segment
+            while os.path.exists(self._sciezka(self._numer + 1)):
+                self._numer += 1
+            # O_APPEND: jeden write() trafia w całości na koniec pliku także przy wielu procesach
+            deskryptor = os.open(self._sciezka(self._numer), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(deskryptor, dane)
+                os.fsync(deskryptor)
+                rozmiar = os.fstat(deskryptor).st_size
+            finally:
+                os.close(deskryptor)
+            if rozmiar >= self.maks_rozmiar_segmentu:
+                self._rotuj()
+
+    def _rotuj(self):
+        self._numer += 1
+        try:
+            open(self._sciezka(self._numer), "xb").close()
+        except FileExistsError:
+            pass
+        for numer in self._numery_segmentow()[:-self.maks_segmentow]:
+            try:
+                os.remove(self._sciezka(numer))
+            except FileNotFoundError:
+                pass
+
+    def _zapisuj_w_tle(self):
+        while not self._stop.wait(self.interwal_zapisu):
+            try:
+                self.zapisz()
+            except Exception as e:
+                if self.ostatni_blad is None:
+                    logger.exception("Nie udało się zapisać historii w %s", self.katalog)
+                self.ostatni_blad = e
+            else:
+                self.ostatni_blad = None
+
+    def zamknij(self):
+        self._stop.set()
+        self.zapisz()
+
+    def ostatnie_surowe(self, limit: int) -> list:
+        """Ostatnie `limit` wpisów jako krotki (czas_ns, operacja), od najstarszego"""
+        if limit <= 0:
+            return []
+        with self._blokada:
+            linie = self._oczekujace[-limit:][::-1]
+        with self._blokada_pliku:
+            numery = self._numery_segmentow()
+        for numer in reversed(numery):
+            if len(linie) >= limit:
+                break
+            try:
+                linie.extend(_ostatnie_linie(self._sciezka(numer), limit - len(linie)))
+            except FileNotFoundError:
+                continue
+
+        wpisy = []
+        for linia in reversed(linie):
+            try:
+                wpis = json.loads(linia)
+            except ValueError:
+                continue
+            wpisy.append((wpis["czas"], wpis["operacja"]))
+        return wpisy
+
+    def ostatnie(self, limit: int) -> list:
+        return [formatuj_wpis(*wpis) for wpis in self.ostatnie_surowe(limit)]
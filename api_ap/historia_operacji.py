@@ -0,0 +1,110 @@
+import contextlib
+import datetime
+import heapq
+import os
+import threading
+import time
+
+DOMYSLNY_ROZMIAR = 100_000
+
+
+def formatuj_wpis(czas_ns: int, operacja: str) -> dict:
+    """Zamień surowy wpis (czas w nanosekundach, opis) na słownik dla /historia"""
+    czas = datetime.datetime.fromtimestamp(czas_ns / 1_000_000_000)
+    return {"czas": czas.strftime("%H:%M:%S"), "operacja": operacja}
+
+
+class HistoriaOperacji:
+    """Historia w buforze cyklicznym: dopisanie O(1), najstarsze wpisy są nadpisywane"""
+
+    def __init__(self, rozmiar: int = DOMYSLNY_ROZMIAR, blokada: bool = True):
+        if rozmiar < 1:
+            raise ValueError("Rozmiar historii musi być dodatni")
+        self.rozmiar = rozmiar
+        self._bufor = [None] * rozmiar
+        self._zapisane = 0  # liczba wpisów dodanych od początku
+        # bufor zapisywany tylko przez jeden wątek nie potrzebuje blokady
+        self._blokada = threading.Lock() if blokada else contextlib.nullcontext()
+
+    def dodaj(self, operacja: str):
+        czas_ns = time.time_ns()
+        with self._blokada:
+            self._bufor[self._zapisane % self.rozmiar] = (czas_ns, operacja)
+            self._zapisane += 1
+
+    def __len__(self):
+        return min(self._zapisane, self.rozmiar)
+
+    def ostatnie_surowe(self, limit: int) -> list:
+        """Ostatnie `limit` wpisów jako krotki (czas_ns, operacja), od najstarszego"""
+        with self._blokada:
+            koniec = self._zapisane
+            start = koniec - min(max(limit, 0), len(self))
+            return [self._bufor[i % self.rozmiar] for i in range(start, koniec)]
+
+    def ostatnie(self, limit: int) -> list:
+        return [formatuj_wpis(*wpis) for wpis in self.ostatnie_surowe(limit)]
+
+
+class HistoriaPerWatek:
+    """Osobny bufor dla każdego wątku roboczego, scalany dopiero przy odczycie.
+
+    Zapis nie bierze żadnej wspólnej blokady, więc wątki puli serwera
+    nie czekają na siebie nawzajem. Bufory zakończonych wątków są scalane
+    do wspólnego archiwum, więc pamięć nie rośnie z każdym nowym wątkiem.
+    """
+
+    def __init__(self, rozmiar: int = DOMYSLNY_ROZMIAR):
+        self.rozmiar = rozmiar
+        self._lokalne = threading.local()
+        self._bufory = []  # pary (wątek, bufor)
+        self._archiwum = []  # ostatnie wpisy zakończonych wątków, od najstarszego
+        self._blokada_rejestru = threading.Lock()
+
+    def _bufor_watku(self) -> HistoriaOperacji:
+        bufor = getattr(self._lokalne, "bufor", None)
+        if bufor is None:
+            bufor = HistoriaOperacji(self.rozmiar, blokada=False)
+            self._lokalne.bufor = bufor
+            with self._blokada_rejestru:
+                self._zarchiwizuj_zakonczone()
+                self._bufory.append((threading.current_thread(), bufor))
+        return bufor
+
+    def _zarchiwizuj_zakonczone(self):
+        """Przenieś wpisy zakończonych wątków do archiwum (wywoływane pod blokadą rejestru)"""
+        zakonczone = [bufor for watek, bufor in self._bufory if not watek.is_alive()]
+        if not zakonczone:
+            return
+        czesci = [self._archiwum] + [bufor.ostatnie_surowe(self.rozmiar) for bufor in zakonczone]
+        self._archiwum = list(heapq.merge(*czesci))[-self.rozmiar:]
+        self._bufory = [(watek, bufor) for watek, bufor in self._bufory if watek.is_alive()]
+
+    def dodaj(self, operacja: str):
+        self._bufor_watku().dodaj(operacja)
+
+    def __len__(self):
+        with self._blokada_rejestru:
+            bufory = [bufor for _, bufor in self._bufory]
+            archiwum = len(self._archiwum)
+        return min(archiwum + sum(len(bufor) for bufor in bufory), self.rozmiar)
+
+    def ostatnie_surowe(self, limit: int) -> list:
+        limit = min(limit, self.rozmiar)
+        with self._blokada_rejestru:
+            bufory = [bufor for _, bufor in self._bufory]
+            czesci = [self._archiwum[-limit:] if limit > 0 else []]
+        czesci += [bufor.ostatnie_surowe(limit) for bufor in bufory]
+        scalone = list(heapq.merge(*czesci))
+        return scalone[-limit:] if limit > 0 else []
+
+    def ostatnie(self, limit: int) -> list:
+        return [formatuj_wpis(*wpis) for wpis in self.ostatnie_surowe(limit)]
+
+
+def utworz_historie():
+    """Wybierz rodzaj historii na podstawie zmiennych środowiskowych"""
+    rozmiar = int(os.environ.get("KALKULATOR_HISTORIA_ROZMIAR", DOMYSLNY_ROZMIAR))
+    if os.environ.get("KALKULATOR_HISTORIA_TRYB", "wspolna") == "watki":
+        return HistoriaPerWatek(rozmiar)
+    return HistoriaOperacji(rozmiar)
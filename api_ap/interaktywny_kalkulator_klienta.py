@@ -1,13 +1,43 @@
 import requests
 import json
+from urllib.parse import quote
 
+try:
+    from websockets.exceptions import ConnectionClosed
+    from websockets.sync.client import connect as polacz_ws
+except ImportError:
+    polacz_ws = None
+    ConnectionClosed = OSError
 
 
 
 class IneraktywnyKalkulator:
-    def __init__(self, base_url="http://localhost:8010"):
+    def __init__(self, base_url="http://localhost:8010", uzyj_ws=True):
         self.base_url = base_url
         self.historia = []
+        self.ws = None
+        self.seq = 0
+        if uzyj_ws:
+            self.polacz_ws()
+
+    def polacz_ws(self):
+        """Otwórz jedno połączenie WebSocket do /ws, jeśli serwer i biblioteka na to pozwalają"""
+        if polacz_ws is None:
+            return False
+        try:
+            self.ws = polacz_ws(self.base_url.replace("http", "ws", 1) + "/ws")
+            return True
+        except Exception:
+            self.ws = None
+            return False
+
+    def zamknij(self):
+        if self.ws is not None:
+            try:
+                self.ws.close()
+            except (ConnectionClosed, OSError):
+                pass
+            self.ws = None
     def pokaz_menu(self):
         print("INTERAKTYWNY KALKULATOR REST API")
         print("\nWybierz operację:")  # lista opcji dla użytkownika
@@ -39,25 +69,65 @@ class IneraktywnyKalkulator:
         except Exception as e:
             return {"error": str(e)}
 
+    def wykonaj_http(self, operacja):
+        """Jedna operacja ({op, a, b} albo {wyrazenie}) zwykłym GET"""
+        if "wyrazenie" in operacja:
+            return self.wykonaj_zapytanie(f"oblicz/{quote(operacja['wyrazenie'])}")
+        if operacja["op"] == "pierwiastek":
+            return self.wykonaj_zapytanie(f"pierwiastek/{operacja['a']}/0")
+        return self.wykonaj_zapytanie(f"{operacja['op']}/{operacja['a']}/{operacja.get('b', 0)}")
+
+    def wykonaj_operacje(self, op, a, b=0):
+        """Wykonaj operację przez WebSocket, a gdy go nie ma - zwykłym GET"""
+        return self.wykonaj_skrypt([{"op": op, "a": a, "b": b}])[0]
+
+    def wykonaj_skrypt(self, operacje, okno=256):
+        """Wykonaj listę operacji ({op, a, b} albo {wyrazenie}) przez jedno połączenie.
+
+        Zapytania są wysyłane bez czekania na odpowiedzi (najwyżej `okno` naraz
+        w drodze), a wyniki wracają w tej samej kolejności. Gdy połączenia nie
+        ma albo zostanie zerwane, operacje bez odpowiedzi idą zwykłym GET.
+        """
+        operacje = list(operacje)
+        wyniki = []
+        if self.ws is not None:
+            w_drodze = 0
+            try:
+                for operacja in operacje:
+                    self.seq += 1
+                    self.ws.send(json.dumps({"seq": self.seq, **operacja}))
+                    w_drodze += 1
+                    if w_drodze >= okno:
+                        wyniki.append(json.loads(self.ws.recv()))
+                        w_drodze -= 1
+                for _ in range(w_drodze):
+                    wyniki.append(json.loads(self.ws.recv()))
+            except (ConnectionClosed, OSError):
+                self.zamknij()
+        # operacje są bez skutków ubocznych, więc te w drodze można bezpiecznie powtórzyć
+        for operacja in operacje[len(wyniki):]:
+            wyniki.append(self.wykonaj_http(operacja))
+        return wyniki
+
     def dodaj(self):
         print("DODAWNIE")
         a = self.pobierz_liczbe("Podaj pierwszą liczbę: ")
         b = self.pobierz_liczbe("Podaj drugą liczbę: ")
-        wynik = self.wykonaj_zapytanie(f"/dodaj/{a}/{b}")
+        wynik = self.wykonaj_operacje("dodaj", a, b)
         self.wyswietl_wynik(f"{a} + {b}", wynik)
 
     def odejmowanie(self):
         print("ODEJMOWANIE")
         a = self.pobierz_liczbe("Podaj pierwszą liczbę: ")
         b = self.pobierz_liczbe("Podaj drugą liczbę: ")
-        wynik = self.wykonaj_zapytanie(f"/odejmij/{a}/{b}")
+        wynik = self.wykonaj_operacje("odejmij", a, b)
         self.wyswietl_wynik(f"{a} - {b}", wynik)
 
     def pomnoz(self):
         print("Mnożenie")
         a = self.pobierz_liczbe("Podaj pierwszą liczbę: ")
         b = self.pobierz_liczbe("Podaj drugą liczbę: ")
-        wynik = self.wykonaj_zapytanie(f"/pomnoz/{a}/{b}")
+        wynik = self.wykonaj_operacje("pomnoz", a, b)
         self.wyswietl_wynik(f"{a} * {b}", wynik)
 
     def podziel(self):
@@ -67,14 +137,14 @@ class IneraktywnyKalkulator:
         if b == 0:
             print("Nie można dzielić przez 0!")
             return
-        wynik = self.wykonaj_zapytanie(f"/podziel/{a}/{b}")
+        wynik = self.wykonaj_operacje("podziel", a, b)
         self.wyswietl_wynik(f"{a} / {b}", wynik)
 
     def potega(self):
         print("Potęgowanie")
         a = self.pobierz_liczbe("Podaj pierwszą liczbę: ")
         b = self.pobierz_liczbe("Podaj drugą liczbę: ")
-        wynik = self.wykonaj_zapytanie(f"/potega/{a}/{b}")
+        wynik = self.wykonaj_operacje("potega", a, b)
         self.wyswietl_wynik(f"{a} ^ {b}", wynik)
 
     def pierwiastek(self):
@@ -83,7 +153,7 @@ class IneraktywnyKalkulator:
         if a < 0:
             print("Nie można uzyć liczby ujemnej, wprowadz inna liczbe")
             return
-        wynik = self.wykonaj_zapytanie(f"/pierwiastek/{a}")
+        wynik = self.wykonaj_operacje("pierwiastek", a)
         self.wyswietl_wynik(f"pierwiastek {a}", wynik)
 
 
@@ -149,6 +219,8 @@ class IneraktywnyKalkulator:
                 self.historia()
             elif wybor == "9":
                 print("Do widzenia")
+                self.zamknij()
+                break
 
             else:
                 print("Nieprawidłowy wybór.")
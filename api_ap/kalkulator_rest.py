@@ -1,7 +1,65 @@
-from fastapi import FastAPI, HTTPException
+import functools
+import json
+import math
+import os
+
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+import historia_dziennik
+import historia_operacji
+import pamiec_wynikow
+import precyzja as precyzja_liczb
+import wektor
+import wyrazenia
 
 app = FastAPI(title="Prosty Kalkulator REST")
 
+# KALKULATOR_ASYNC=0 wraca do zwykłych def w puli wątków i odpowiedzi FastAPI (z jsonable_encoder)
+TRYB_SZYBKI = os.environ.get("KALKULATOR_ASYNC", "1") != "0"
+
+class OdpowiedzJSON(JSONResponse):
+    """Odpowiedź JSON serializowana przez orjson, a bez niego przez json"""
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            try:
+                return orjson.dumps(content)
+            except TypeError:
+                # orjson nie zapisze liczb całkowitych spoza 64 bitów, np. wyniku /oblicz/2**100
+                pass
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def trasa_arytmetyczna(sciezka: str, w_puli: bool = False):
+    """Zarejestruj trasę GET dla operacji arytmetycznej.
+
+    W trybie szybkim wynik trafia od razu do OdpowiedzJSON z pominięciem
+    jsonable_encoder, a tanie operacje na float są obsługiwane przez async def
+    bez przeskoku do puli wątków. Trasy z w_puli=True (wyrażenia, tryby
+    dokładne) mogą liczyć długo, więc zostają zwykłym def w puli wątków.
+    """
+    def dekorator(funkcja):
+        if not TRYB_SZYBKI:
+            return app.get(sciezka)(funkcja)
+
+        if w_puli:
+            @functools.wraps(funkcja)
+            def obsluga(*args, **kwargs):
+                return OdpowiedzJSON(funkcja(*args, **kwargs))
+        else:
+            @functools.wraps(funkcja)
+            async def obsluga(*args, **kwargs):
+                return OdpowiedzJSON(funkcja(*args, **kwargs))
+
+        app.get(sciezka, response_class=OdpowiedzJSON)(obsluga)
+        return funkcja
+    return dekorator
+
 @app.get("/")
 def witaj():
     return {"wiadomość": "Kalkulator REST API", "dostępne operacje": [
@@ -11,89 +69,322 @@ def witaj():
         "/podziel/{a}/{b}",
         "/potega/{a}/{b}",
         "/pierwiastek/{a}/{b}",
-        "/historia"
+        "/oblicz/{wyrazenie}?tryb=decimal&precyzja=28",
+        "/dec/{op}/{a}/{b}?tryb=decimal|ulamek&precyzja=28",
+        "POST /batch",
+        "WS /ws",
+        "POST /wektor/{op}",
+        "/historia",
+        "/metryki"
     ]}
 
-@app.get("/dodaj/{a}/{b}")
+def _dodaj(a: float, b: float) -> float:
+    return a + b
+
+def _odejmij(a: float, b: float) -> float:
+    return a - b
+
+def _pomnoz(a: float, b: float) -> float:
+    return a * b
+
+def _podziel(a: float, b: float) -> float:
+    if b == 0:
+        raise ValueError("Nie można dzielić przez 0!")
+    return a / b
+
+def _potega(a: float, b: float) -> float:
+    return a ** b
+
+def _pierwiastek(a: float, b: float) -> float:
+    if a < 0:
+        raise ValueError("Nie można obliczyć pierwiastka z liczby ujemnej")
+    return math.sqrt(a)
+
+# nazwa operacji -> (funkcja, nazwa w odpowiedzi, szablon wpisu do historii)
+OPERACJE = {
+    "dodaj": (_dodaj, "dodawanie", "{a} + {b} = {wynik}"),
+    "odejmij": (_odejmij, "odejmowanie", "{a} - {b} = {wynik}"),
+    "pomnoz": (_pomnoz, "mnożenie", "{a} * {b} = {wynik}"),
+    "podziel": (_podziel, "dzielenie", "{a} / {b} = {wynik}"),
+    "potega": (_potega, "potęgowanie", "{a} ** {b} = {wynik}"),
+    "pierwiastek": (_pierwiastek, "pierwiastek", "√{a} = {wynik}"),
+}
+
+# KALKULATOR_PAMIEC=1 włącza zapamiętywanie wyników wspólne dla wszystkich operacji
+pamiec = pamiec_wynikow.PamiecWynikow() if os.environ.get("KALKULATOR_PAMIEC") == "1" else None
+
+def oblicz(op: str, a: float, b: float) -> float:
+    """Wykonaj operację bez zapisu do historii (rzuca ValueError przy błędzie)"""
+    if op not in OPERACJE:
+        raise ValueError(f"Nieznana operacja: {op}")
+    funkcja = OPERACJE[op][0]
+    if pamiec is None:
+        return funkcja(a, b)
+    # -0.0 == 0.0, ale wyniki się różnią (np. 1 * -0.0), więc znak zera jest częścią klucza
+    klucz = (op, a, b, math.copysign(1.0, a), math.copysign(1.0, b))
+    return pamiec.pobierz_lub_oblicz(klucz, lambda: funkcja(a, b))
+
+def _wykonaj(op: str, a: float, b: float) -> float:
+    """Oblicz wynik dla endpointu i zapisz go w historii"""
+    try:
+        wynik = oblicz(op, a, b)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    zapisz_operacje(OPERACJE[op][2].format(a=a, b=b, wynik=wynik))
+    return wynik
+
+@trasa_arytmetyczna("/dodaj/{a}/{b}")
 def dodaj(a:float, b:float):
     """Dodawanie dwóch liczb"""
-    wynik = a + b
-    zapisz_operacje(f"{a} + {b} = {wynik}")
+    wynik = _wykonaj("dodaj", a, b)
     return {"operacja": "dodawanie", "a": a, "b": b, "wynik": wynik}
 
-@app.get("/odejmij/{a}/{b}")
+@trasa_arytmetyczna("/odejmij/{a}/{b}")
 def odejmij(a:float, b:float):
     """Odejmowanie dwóch liczb"""
-    wynik = a - b
-    zapisz_operacje(f"{a} - {b} = {wynik}")
+    wynik = _wykonaj("odejmij", a, b)
     return {"operacja": "odejmowanie", "a": a, "b": b, "wynik": wynik}
 
-@app.get("/pomnoz/{a}/{b}")
+@trasa_arytmetyczna("/pomnoz/{a}/{b}")
 def pomnoz(a:float, b:float):
     """Mnożenie dwóch liczb"""
-    wynik = a * b
-    zapisz_operacje(f"{a} * {b} = {wynik}")
+    wynik = _wykonaj("pomnoz", a, b)
     return {"operacja": "mnożenie", "a": a, "b": b, "wynik": wynik}
 
-@app.get("/podziel/{a}/{b}")
+@trasa_arytmetyczna("/podziel/{a}/{b}")
 def podziel(a:float, b:float):
     """Dzielenie dwóch liczb"""
-    if b == 0:
-        raise HTTPException(status_code=400, detail="Nie można dzielić przez 0!")
-    wynik = a / b
-    zapisz_operacje(f"{a} / {b} = {wynik}")
+    wynik = _wykonaj("podziel", a, b)
     return {"operacja": "dzielenie", "a": a, "b": b, "wynik": wynik}
 
-@app.get("/potega/{a}/{b}")
+@trasa_arytmetyczna("/potega/{a}/{b}")
 def potega(a:float, b:float):
     """Potęgowanie: a do potęgi b"""
-    wynik = a ** b
-    zapisz_operacje(f"{a} ** {b} = {wynik}")
+    wynik = _wykonaj("potega", a, b)
     return {"operacja": "potęgowanie", "a": a, "b": b, "wynik": wynik}
 
-@app.get("/pierwiastek/{a}/{b}")
+@trasa_arytmetyczna("/pierwiastek/{a}/{b}")
 def pierwiastek(a:float, b:float):
     """Pierwiastek kwadratowy"""
-    if a < 0:
-        raise HTTPException(status_code=400, detail="Nie można obliczyć pierwiastka z liczby ujemnej")
-    import math
-    wynik = math.sqrt(a)
-    zapisz_operacje(f"√{a} = {wynik}")
+    wynik = _wykonaj("pierwiastek", a, b)
     return {"operacja": "pierwiastek", "liczba": a, "wynik": wynik}
 
-@app.get("/oblicz/{wyrazenie}")
-def oblicz_wyrazenie(wyrazenie: str):
-    """Dowolne wyrażenie matematyczne"""
+@trasa_arytmetyczna("/dec/{op}/{a}/{b}", w_puli=True)
+def oblicz_precyzyjnie(op: str, a: str, b: str, tryb: str = "decimal",
+                       precyzja: int = precyzja_liczb.DOMYSLNA_PRECYZJA):
+    """Operacja w trybie dokładnym: decimal (z precyzją) albo ulamek"""
+    if tryb not in ("decimal", "ulamek"):
+        raise HTTPException(status_code=400, detail="Tryb musi być decimal albo ulamek")
     try:
-        dozwolone_znaki = set("0123456789+-*/.() ")
-        if not all(z in dozwolone_znaki for z in wyrazenie):
-            raise ValueError("Niedozwolone znaki w wyrażeniu")
+        wynik = precyzja_liczb.oblicz_dokladnie(op, a, b, tryb, precyzja)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    zapisz_operacje(OPERACJE[op][2].format(a=a, b=b, wynik=wynik))
+    return {"operacja": OPERACJE[op][1], "a": a, "b": b, "wynik": precyzja_liczb.na_tekst(wynik),
+            "tryb": tryb, "precyzja": precyzja}
 
-        wynik = eval(wyrazenie)
+def policz_wyrazenie(wyrazenie: str, tryb: str = "float", precyzja: int = precyzja_liczb.DOMYSLNA_PRECYZJA):
+    """Oblicz wyrażenie bez zapisu do historii"""
+    return wyrazenia.policz(wyrazenie, tryb, precyzja)
+
+@trasa_arytmetyczna("/oblicz/{wyrazenie}", w_puli=True)
+def oblicz_wyrazenie(wyrazenie: str, tryb: str = "float", precyzja: int = precyzja_liczb.DOMYSLNA_PRECYZJA):
+    """Dowolne wyrażenie matematyczne (tryb: float, decimal albo ulamek)"""
+    try:
+        wynik = policz_wyrazenie(wyrazenie, tryb, precyzja)
         zapisz_operacje(f"{wyrazenie} = {wynik}")
+        if tryb != "float":
+            return {"wyrażenie": wyrazenie, "wynik": precyzja_liczb.na_tekst(wynik), "tryb": tryb}
         return {"wyrażenie": wyrazenie, "wynik": wynik}
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Błąd obliczeń: {str(e)}")
 
+def _wczytaj_linie(linia: str):
+    """Jeden element NDJSON; niepoprawna linia staje się błędem tylko tego elementu"""
+    try:
+        return json.loads(linia)
+    except ValueError:
+        return ValueError("Niepoprawny JSON w linii")
+
+def _wczytaj_batch(tresc: bytes, typ_tresci: str) -> list:
+    """Zamień treść żądania (tablica JSON albo NDJSON) na listę elementów"""
+    tekst = tresc.decode("utf-8").strip()
+    if "ndjson" in typ_tresci or not tekst.startswith("["):
+        return [_wczytaj_linie(linia) for linia in tekst.splitlines() if linia.strip()]
+    elementy = json.loads(tekst)
+    if not isinstance(elementy, list):
+        raise ValueError("Oczekiwano tablicy JSON")
+    return elementy
 
-historia = []
+def _sprawdz_wynik(wynik):
+    """Wynik, który da się zapisać w JSON-ie; zespolony albo inf/nan to błąd elementu"""
+    if isinstance(wynik, complex):
+        raise ValueError("Błąd obliczeń: wynik nie jest liczbą rzeczywistą")
+    if isinstance(wynik, float) and not math.isfinite(wynik):
+        raise ValueError("Błąd obliczeń: wynik poza zakresem liczb")
+    return wynik
 
-def zapisz_operacje(operacja: str):
-    import datetime
+def _oblicz_element(element) -> dict:
+    """Oblicz jeden element batcha: {op, a, b} albo {wyrazenie}"""
+    if isinstance(element, ValueError):
+        raise element
+    if not isinstance(element, dict):
+        raise ValueError("Element musi być obiektem JSON")
+    if "wyrazenie" in element:
+        try:
+            wynik = policz_wyrazenie(element["wyrazenie"])
+        except Exception as e:
+            raise ValueError(f"Błąd obliczeń: {str(e)}")
+        return {"wyrażenie": element["wyrazenie"], "wynik": _sprawdz_wynik(wynik)}
+
+    op = element.get("op")
+    if op not in OPERACJE:
+        raise ValueError(f"Nieznana operacja: {op}")
+    try:
+        a = float(element["a"])
+        b = float(element.get("b", 0))
+    except (KeyError, TypeError, ValueError, OverflowError):
+        # OverflowError: liczba całkowita z JSON-a za duża na float, np. 10**400
+        raise ValueError("Pola a i b muszą być liczbami")
+    if not (math.isfinite(a) and math.isfinite(b)):
+        raise ValueError("Pola a i b muszą być liczbami")
+    try:
+        wynik = oblicz(op, a, b)
+    except ArithmeticError as e:
+        raise ValueError(f"Błąd obliczeń: {str(e)}")
+    _sprawdz_wynik(wynik)
+    if op == "pierwiastek":
+        return {"operacja": OPERACJE[op][1], "liczba": a, "wynik": wynik}
+    return {"operacja": OPERACJE[op][1], "a": a, "b": b, "wynik": wynik}
+
+def _oblicz_batch(elementy: list) -> tuple:
+    """Wyniki wszystkich elementów i liczba błędów (wywoływane w puli wątków)"""
+    wyniki = []
+    bledy = 0
+    for indeks, element in enumerate(elementy):
+        try:
+            wyniki.append({"indeks": indeks, **_oblicz_element(element)})
+        except ValueError as e:
+            bledy += 1
+            wyniki.append({"indeks": indeks, "error": str(e)})
+    return wyniki, bledy
+
+@app.post("/batch")
+async def batch(request: Request):
+    """Wiele operacji w jednym żądaniu (tablica JSON albo NDJSON)"""
+    try:
+        elementy = _wczytaj_batch(await request.body(), request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Niepoprawna treść żądania: {str(e)}")
+
+    wyniki, bledy = await run_in_threadpool(_oblicz_batch, elementy)
+    zapisz_operacje(f"batch: {len(elementy)} operacji, błędów: {bledy}")
+    return {"wyniki": wyniki, "liczba operacji": len(elementy), "liczba błędów": bledy}
 
-    historia.append({
-        "czas": datetime.datetime.now().strftime("%H:%M:%S"),
-        "operacja": operacja,
-    })
+def _odpowiedz_ws(dane, pierwszy_seq: int) -> tuple:
+    """Odpowiedź na jedną wiadomość /ws, liczba elementów i błędów (wywoływane w puli wątków)"""
+    elementy = dane if isinstance(dane, list) else [dane]
+    odpowiedzi = []
+    bledy = 0
+    for numer, element in enumerate(elementy, start=pierwszy_seq):
+        seq = element.get("seq", numer) if isinstance(element, dict) else numer
+        try:
+            odpowiedzi.append({"seq": seq, **_oblicz_element(element)})
+        except ValueError as e:
+            bledy += 1
+            odpowiedzi.append({"seq": seq, "error": str(e)})
+
+    odpowiedz = odpowiedzi if isinstance(dane, list) else odpowiedzi[0]
+    return json.dumps(odpowiedz, ensure_ascii=False), len(elementy), bledy
+
+@app.websocket("/ws")
+async def sesja_ws(websocket: WebSocket):
+    """Sesja kalkulatora przez jedno połączenie.
+
+    Klient wysyła elementy jak w /batch (pojedynczo albo tablicą), opcjonalnie
+    z polem seq. Odpowiedzi wracają w kolejności zapytań, z tym samym seq
+    (albo kolejnym numerem nadanym przez serwer), więc klient może wysyłać
+    następne operacje bez czekania na wyniki poprzednich.
+    """
+    await websocket.accept()
+    liczba = 0
+    bledy = 0
+    try:
+        while True:
+            tekst = await websocket.receive_text()
+            try:
+                dane = json.loads(tekst)
+            except ValueError:
+                await websocket.send_text(json.dumps({"seq": None, "error": "Niepoprawny JSON"}))
+                continue
+
+            # tablica wyrażeń potrafi liczyć się długo, więc jak w /batch poza pętlą zdarzeń
+            tekst, liczba_elementow, bledy_elementow = await run_in_threadpool(_odpowiedz_ws, dane, liczba)
+            liczba += liczba_elementow
+            bledy += bledy_elementow
+            await websocket.send_text(tekst)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if liczba:
+            zapisz_operacje(f"ws: {liczba} operacji, błędów: {bledy}")
+
+def _wektor_json(op: str, tresc: bytes) -> str:
+    """Parsowanie, obliczenia i serializacja dla /wektor (wywoływane w puli wątków)"""
+    try:
+        dane = json.loads(tresc)
+        wynik, maska = wektor.oblicz_wektorowo(op, dane["a"], dane.get("b", 0.0))
+    except (KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Oczekiwano obiektu JSON z polem a")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    bledy = int(maska.sum())
+    zapisz_operacje(f"wektor {op}: {wynik.size} elementów, błędów: {bledy}")
+    odpowiedz = {
+        "operacja": op,
+        "wynik": wektor.na_liste(wynik, maska),
+        "maska błędów": maska.tolist(),
+        "liczba błędów": bledy,
+    }
+    return json.dumps(odpowiedz, ensure_ascii=False)
+
+@app.post("/wektor/{op}")
+async def wektor_operacja(op: str, request: Request):
+    """Operacja na tablicach: {"a": [...], "b": [...] albo liczba}"""
+    # przy milionie elementów parsowanie i NumPy zajęłyby pętlę zdarzeń na długo
+    tresc = await run_in_threadpool(_wektor_json, op, await request.body())
+    # gotowy JSON zamiast jsonable_encoder, który przy milionie elementów jest bardzo wolny
+    return Response(content=tresc, media_type="application/json")
+
+# KALKULATOR_HISTORIA_KATALOG włącza trwałą historię w plikach, wspólną dla workerów
+if os.environ.get("KALKULATOR_HISTORIA_KATALOG"):
+    historia = historia_dziennik.DziennikHistorii(os.environ["KALKULATOR_HISTORIA_KATALOG"])
+else:
+    historia = historia_operacji.utworz_historie()
+
+def zapisz_operacje(operacja: str):
+    historia.dodaj(operacja)
 
-    if len(historia) > 20:
-        historia.pop(0)
+@app.get("/metryki")
+def metryki():
+    """Statystyki pamięci podręcznych kalkulatora"""
+    wyrazenia_info = wyrazenia._kompiluj.cache_info()
+    return {
+        "pamięć wyników": pamiec.metryki() if pamiec is not None else {"włączona": False},
+        "pamięć wyrażeń": {
+            "trafienia": wyrazenia_info.hits,
+            "chybienia": wyrazenia_info.misses,
+            "wpisy": wyrazenia_info.currsize,
+            "maks wpisów": wyrazenia_info.maxsize,
+        },
+    }
 
 @app.get("/historia")
 def pokaz_historie(limit: int = 10):
     """Pokaż historię operacji"""
-    return {"historia": historia[-limit:], "liczba operacji": len(historia)}
+    return {"historia": historia.ostatnie(limit), "liczba operacji": len(historia)}
 
 if __name__ == "__main__":
     import uvicorn
@@ -110,5 +401,10 @@ if __name__ == "__main__":
     print("6. Pierwiastek:    /pierwiastek/25")
     print("7. Wyrażenie:      /oblicz/(10+5)*2")
     print("8. Historia:       /historia")
+    print("   Metryki:        /metryki")
+    print("   Dokładnie:      /dec/dodaj/0.1/0.2  /oblicz/1%2F3?tryb=ulamek")
+    print("9. Batch:          POST /batch  [{\"op\": \"dodaj\", \"a\": 1, \"b\": 2}, {\"wyrazenie\": \"2*3\"}]")
+    print("   Sesja WS:       ws://127.0.0.1:8010/ws  {\"seq\": 1, \"op\": \"dodaj\", \"a\": 1, \"b\": 2}")
+    print("10. Wektor:       POST /wektor/dodaj  {\"a\": [1, 2], \"b\": 3}")
 
     uvicorn.run(app, host="127.0.0.1", port=8010)
@@ -0,0 +1,101 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# kody, po których warto spróbować ponownie (serwer przeciążony albo restartowany)
+KODY_DO_PONOWIENIA = (502, 503, 504)
+
+
+def _sciezka(op: str, a, b) -> str:
+    return f"/{op}/{a}/{b}"
+
+
+def _odpowiedz(odpowiedz) -> dict:
+    """Wynik z serwera albo słownik z błędem, jak w IneraktywnyKalkulator"""
+    if odpowiedz.status_code == 200:
+        return odpowiedz.json()
+    return {"error": f"Błąd {odpowiedz.status_code}", "details": odpowiedz.text}
+
+
+class KlientKalkulatora:
+    """Klient kalkulatora REST z pulą połączeń keep-alive i ponawianiem zapytań"""
+
+    def __init__(self, base_url="http://localhost:8010", rozmiar_puli=64, proby=3, opoznienie=0.1):
+        self.base_url = base_url.rstrip("/")
+        self.sesja = requests.Session()
+        ponawianie = Retry(
+            total=proby,
+            backoff_factor=opoznienie,
+            status_forcelist=KODY_DO_PONOWIENIA,
+            allowed_methods=["GET"],
+            # po ostatniej próbie zwróć odpowiedź (błąd jak w kliencie async) zamiast RetryError
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=rozmiar_puli, max_retries=ponawianie)
+        self.sesja.mount("http://", adapter)
+        self.sesja.mount("https://", adapter)
+
+    def oblicz(self, op: str, a, b=0) -> dict:
+        odpowiedz = self.sesja.get(self.base_url + _sciezka(op, a, b))
+        return _odpowiedz(odpowiedz)
+
+    def map(self, op: str, pary, concurrency: int = 8) -> list:
+        """Wykonaj operację dla każdej pary (a, b), najwyżej `concurrency` zapytań naraz"""
+        with ThreadPoolExecutor(max_workers=concurrency) as wykonawca:
+            return list(wykonawca.map(lambda para: self.oblicz(op, *para), pary))
+
+    def zamknij(self):
+        self.sesja.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.zamknij()
+
+
+class AsyncKlientKalkulatora:
+    """Asynchroniczna wersja klienta, oparta na httpx.AsyncClient"""
+
+    def __init__(self, base_url="http://localhost:8010", rozmiar_puli=64, proby=3, opoznienie=0.1):
+        self.proby = proby
+        self.opoznienie = opoznienie
+        limity = httpx.Limits(max_connections=rozmiar_puli, max_keepalive_connections=rozmiar_puli)
+        self.klient = httpx.AsyncClient(base_url=base_url.rstrip("/"), limits=limity)
+
+    async def oblicz(self, op: str, a, b=0) -> dict:
+        for proba in range(self.proby + 1):
+            ostatnia = proba == self.proby
+            try:
+                odpowiedz = await self.klient.get(_sciezka(op, a, b))
+            except httpx.TransportError:
+                if ostatnia:
+                    raise
+            else:
+                if odpowiedz.status_code not in KODY_DO_PONOWIENIA or ostatnia:
+                    return _odpowiedz(odpowiedz)
+            # wykładniczy czas oczekiwania: 0.1 s, 0.2 s, 0.4 s...
+            await asyncio.sleep(self.opoznienie * 2 ** proba)
+
+    async def map(self, op: str, pary, concurrency: int = 8) -> list:
+        """Wykonaj operację dla każdej pary (a, b), najwyżej `concurrency` zapytań naraz"""
+        semafor = asyncio.Semaphore(concurrency)
+
+        async def jedno(para):
+            async with semafor:
+                return await self.oblicz(op, *para)
+
+        return await asyncio.gather(*(jedno(para) for para in pary))
+
+    async def zamknij(self):
+        await self.klient.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.zamknij()
@@ -0,0 +1,158 @@
+import threading
+from collections import OrderedDict
+
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    InlineFragmentNode,
+    IntValueNode,
+    OperationDefinitionNode,
+    get_named_type,
+    get_nullable_type,
+    is_leaf_type,
+    is_list_type,
+)
+from strawberry.extensions import SchemaExtension
+
+DOMYSLNA_LICZNOSC = 10
+ARGUMENTY_LICZNOSCI = ("first", "last", "limit")
+MAKS_DOKUMENTOW = 1000
+
+
+def _licznosc_z_argumentow(pole: FieldNode, maks_licznosc=None):
+    """Liczba z argumentu first/last/limit podanego wprost w zapytaniu (zmienne się nie liczą).
+
+    Ujemna wartość liczy się jak 0: inaczej pole z first: -100000000 obniżyłoby
+    koszt całego zapytania i pozwoliło ominąć limit. Wartość ponad maks_licznosc
+    (największą stronę, jaką zwraca resolver) liczy się jak maks_licznosc.
+    """
+    for argument in pole.arguments or ():
+        if argument.name.value in ARGUMENTY_LICZNOSCI and isinstance(argument.value, IntValueNode):
+            licznosc = max(0, int(argument.value.value))
+            return licznosc if maks_licznosc is None else min(licznosc, maks_licznosc)
+    return None
+
+
+class AnalizatorKosztu:
+    """Statyczny koszt i głębokość zapytania GraphQL, liczone na sparsowanym dokumencie.
+
+    Każdy obiekt zwrócony przez pole kosztuje 1, pola skalarne nic. Pole-lista
+    mnoży koszt swojej zawartości przez spodziewaną liczność: z argumentu
+    first/last/limit (także na polu-obiekcie nad listą, jak w połączeniach
+    Relay), a jeśli go nie ma albo jest zmienną - z `licznosci`
+    {(typ, pole): liczba} lub DOMYSLNA_LICZNOSC. Liczba z argumentu jest
+    przycinana do maks_licznosc, jeśli resolwery i tak nie zwracają więcej.
+    Pola introspekcji (__*) są pomijane. Dokument z kilkoma operacjami
+    kosztuje tyle, co najdroższa.
+
+    Wyniki są zapamiętywane po tekście zapytania (LRU), więc powtarzane
+    zapytania sprawdza jedno wyszukanie w słowniku.
+    """
+
+    def __init__(self, licznosci=None, domyslna_licznosc: int = DOMYSLNA_LICZNOSC,
+                 maks_dokumentow: int = MAKS_DOKUMENTOW, maks_licznosc=None):
+        self.licznosci = dict(licznosci or {})
+        self.domyslna_licznosc = domyslna_licznosc
+        self.maks_licznosc = maks_licznosc
+        self.maks_dokumentow = maks_dokumentow
+        self._wyniki = OrderedDict()
+        self._blokada = threading.Lock()
+
+    def policz(self, schemat, tekst, dokument) -> tuple:
+        """(koszt, głębokość) dokumentu; schemat to GraphQLSchema z graphql-core"""
+        if tekst is not None:
+            with self._blokada:
+                wynik = self._wyniki.get(tekst)
+                if wynik is not None:
+                    self._wyniki.move_to_end(tekst)
+                    return wynik
+
+        fragmenty = {d.name.value: d for d in dokument.definitions if isinstance(d, FragmentDefinitionNode)}
+        wynik = (0, 0)
+        for definicja in dokument.definitions:
+            if isinstance(definicja, OperationDefinitionNode):
+                typ = schemat.get_root_type(definicja.operation)
+                koszt, glebokosc = self._zbior(schemat, definicja.selection_set, typ, fragmenty, None, ())
+                wynik = (max(wynik[0], koszt), max(wynik[1], glebokosc))
+
+        if tekst is not None:
+            with self._blokada:
+                self._wyniki[tekst] = wynik
+                while len(self._wyniki) > self.maks_dokumentow:
+                    self._wyniki.popitem(last=False)
+        return wynik
+
+    def _zbior(self, schemat, zbior, typ, fragmenty, licznosc, odwiedzone) -> tuple:
+        koszt = 0
+        glebokosc = 0
+        for wybor in zbior.selections:
+            if isinstance(wybor, FieldNode):
+                if wybor.name.value.startswith("__"):
+                    continue
+                pole = getattr(typ, "fields", {}).get(wybor.name.value)
+                if pole is None:
+                    continue
+                k, g = self._pole(schemat, typ.name, wybor, pole, fragmenty, licznosc, odwiedzone)
+            elif isinstance(wybor, InlineFragmentNode):
+                podtyp = schemat.get_type(wybor.type_condition.name.value) if wybor.type_condition else typ
+                k, g = self._zbior(schemat, wybor.selection_set, podtyp, fragmenty, licznosc, odwiedzone)
+            elif isinstance(wybor, FragmentSpreadNode):
+                nazwa = wybor.name.value
+                fragment = fragmenty.get(nazwa)
+                if fragment is None or nazwa in odwiedzone:
+                    continue
+                podtyp = schemat.get_type(fragment.type_condition.name.value)
+                k, g = self._zbior(schemat, fragment.selection_set, podtyp, fragmenty, licznosc,
+                                   odwiedzone + (nazwa,))
+            else:
+                continue
+            koszt += k
+            glebokosc = max(glebokosc, g)
+        return koszt, glebokosc
+
+    def _pole(self, schemat, nazwa_typu, wybor, pole, fragmenty, licznosc, odwiedzone) -> tuple:
+        typ_pola = get_named_type(pole.type)
+        if wybor.selection_set is None or is_leaf_type(typ_pola):
+            return 0, 1
+
+        z_argumentu = _licznosc_z_argumentow(wybor, self.maks_licznosc)
+        if z_argumentu is not None:
+            licznosc = z_argumentu
+        if is_list_type(get_nullable_type(pole.type)):
+            if licznosc is None:
+                licznosc = self.licznosci.get((nazwa_typu, wybor.name.value), self.domyslna_licznosc)
+            mnoznik, licznosc = licznosc, None
+        else:
+            # pole-obiekt (np. połączenie Relay) przekazuje first/last do listy pod sobą
+            mnoznik = 1
+
+        koszt, glebokosc = self._zbior(schemat, wybor.selection_set, typ_pola, fragmenty, licznosc, odwiedzone)
+        return mnoznik * (1 + koszt), glebokosc + 1
+
+
+def _blad(kod: str, wiadomosc: str, **dodatkowe) -> GraphQLError:
+    return GraphQLError(wiadomosc, extensions={"code": kod, **dodatkowe})
+
+
+class LimitKosztu(SchemaExtension):
+    """Odrzuca przed wykonaniem zapytania droższe niż maks_koszt albo głębsze niż maks_glebokosc"""
+
+    def __init__(self, analizator: AnalizatorKosztu, maks_koszt: int, maks_glebokosc: int, *,
+                 execution_context=None):
+        self.analizator = analizator
+        self.maks_koszt = maks_koszt
+        self.maks_glebokosc = maks_glebokosc
+
+    def on_execute(self):
+        kontekst = self.execution_context
+        koszt, glebokosc = self.analizator.policz(kontekst.schema._schema, kontekst.query,
+                                                  kontekst.graphql_document)
+        if glebokosc > self.maks_glebokosc:
+            raise _blad("QUERY_TOO_DEEP", f"Zapytanie za głębokie: {glebokosc} > {self.maks_glebokosc}",
+                        glebokosc=glebokosc, maks_glebokosc=self.maks_glebokosc)
+        if koszt > self.maks_koszt:
+            raise _blad("QUERY_TOO_COMPLEX", f"Zapytanie za drogie: koszt {koszt} > {self.maks_koszt}",
+                        koszt=koszt, maks_koszt=self.maks_koszt)
+        yield
@@ -0,0 +1,69 @@
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+HOST = "127.0.0.1"
+PORT = 8011
+LICZBA_ZAPYTAN = 5000
+ROWNOLEGLOSC = 32
+
+
+def uruchom_serwer(tryb_async: str) -> subprocess.Popen:
+    """Uruchom kalkulator_rest pod uvicornem w osobnym procesie"""
+    srodowisko = dict(os.environ, KALKULATOR_ASYNC=tryb_async)
+    serwer = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "kalkulator_rest:app", "--host", HOST, "--port", str(PORT),
+         "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=srodowisko,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://{HOST}:{PORT}/")
+            return serwer
+        except httpx.TransportError:
+            time.sleep(0.1)
+    serwer.kill()
+    raise RuntimeError("Serwer nie wystartował")
+
+
+async def zmierz_opoznienia() -> list:
+    """Wyślij LICZBA_ZAPYTAN zapytań przy ROWNOLEGLOSC naraz, zwróć czasy w ms"""
+    opoznienia = []
+    semafor = asyncio.Semaphore(ROWNOLEGLOSC)
+    limity = httpx.Limits(max_connections=ROWNOLEGLOSC, max_keepalive_connections=ROWNOLEGLOSC)
+
+    async with httpx.AsyncClient(base_url=f"http://{HOST}:{PORT}", limits=limity) as klient:
+        async def jedno(i):
+            async with semafor:
+                start = time.perf_counter()
+                odpowiedz = await klient.get(f"/pomnoz/{i}/3")
+                opoznienia.append((time.perf_counter() - start) * 1000)
+                odpowiedz.raise_for_status()
+
+        await asyncio.gather(*(jedno(i) for i in range(LICZBA_ZAPYTAN)))
+    return opoznienia
+
+
+def percentyl(wartosci: list, p: int) -> float:
+    return statistics.quantiles(wartosci, n=100)[p - 1]
+
+
+if __name__ == "__main__":
+    print(f"TEST OBCIĄŻENIA KALKULATORA ({LICZBA_ZAPYTAN} zapytań, {ROWNOLEGLOSC} równolegle)")
+    for tryb_async, opis in [("0", "def + pula wątków + JSONResponse"), ("1", "async def bez puli + OdpowiedzJSON")]:
+        serwer = uruchom_serwer(tryb_async)
+        try:
+            start = time.perf_counter()
+            opoznienia = asyncio.run(zmierz_opoznienia())
+            czas = time.perf_counter() - start
+        finally:
+            serwer.terminate()
+            serwer.wait()
+        print(f"{opis:35s} p50: {percentyl(opoznienia, 50):6.2f} ms  p99: {percentyl(opoznienia, 99):6.2f} ms"
+              f"  {LICZBA_ZAPYTAN / czas:8.0f} zapytań/s")
@@ -1,7 +1,19 @@
+import asyncio
+import base64
+import binascii
+import os
 import strawberry
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
+from strawberry.asgi import GraphQL
+from strawberry.dataloader import DataLoader
+from strawberry.extensions import ParserCache, SchemaExtension, ValidationCache
+
+from koszt_zapytan import AnalizatorKosztu, LimitKosztu
+from repozytorium_ocen import RepozytoriumOcen
+from zapytania_utrwalone import RejestrZapytan, UtrwaloneZapytania
+
 @strawberry.type
 class Student:
     id: int
@@ -10,12 +22,21 @@ class Student:
     kierunek: str
     rok_studiow: int
 
+    #oceny studenta przez loader - jedno przejście po ocenach dla wszystkich studentów z zapytania
+    @strawberry.field
+    def oceny(self, info: strawberry.Info) -> List["Ocena"]:
+        return _laduj(info, "oceny_studenta", self.id)
+
 @strawberry.type
 class Przedmiot:
     id: int
     nazwa: str
     prowadzacy: str
 
+    @strawberry.field
+    def oceny(self, info: strawberry.Info) -> List["Ocena"]:
+        return _laduj(info, "oceny_przedmiotu", self.id)
+
 @strawberry.type
 class Ocena:
     id: int
@@ -25,6 +46,14 @@ class Ocena:
     data: str
     komentarz: str
 
+    @strawberry.field
+    def student(self, info: strawberry.Info) -> Optional[Student]:
+        return _laduj(info, "studenci", self.student_id)
+
+    @strawberry.field
+    def przedmiot(self, info: strawberry.Info) -> Optional[Przedmiot]:
+        return _laduj(info, "przedmioty", self.przedmiot_id)
+
 @strawberry.type
 class StatystykiStudenta:
     student: Student
@@ -33,7 +62,73 @@ class StatystykiStudenta:
     najlepsza_ocena: float
     najgorsza_ocena: float
 
+#połączenia w stylu Relay: stronicowanie kursorem zamiast zwracania całych list
+@strawberry.type
+class PageInfo:
+    has_next_page: bool
+    has_previous_page: bool
+    start_cursor: Optional[str]
+    end_cursor: Optional[str]
+
+@strawberry.type
+class StudentEdge:
+    cursor: str
+    node: Student
+
+@strawberry.type
+class StudentConnection:
+    edges: List[StudentEdge]
+    page_info: PageInfo
+
+@strawberry.type
+class OcenaEdge:
+    cursor: str
+    node: Ocena
+
+@strawberry.type
+class OcenaConnection:
+    edges: List[OcenaEdge]
+    page_info: PageInfo
+
+MAKS_STRONA = 100
+
+def kursor(rodzaj: str, id: int) -> str:
+    """Nieprzezroczysty kursor: base64 z "rodzaj:id" """
+    return base64.urlsafe_b64encode(f"{rodzaj}:{id}".encode()).decode()
+
+def _id_z_kursora(rodzaj: str, wartosc: Optional[str]) -> int:
+    if wartosc is None:
+        return 0
+    try:
+        odczytany, _, id = base64.urlsafe_b64decode(wartosc.encode()).decode().partition(":")
+        if odczytany == rodzaj:
+            return int(id)
+    except (binascii.Error, UnicodeError, ValueError):
+        pass
+    raise ValueError("Nieprawidłowy kursor")
+
+def _rozmiar_strony(first: int) -> int:
+    if first < 0:
+        raise ValueError("Argument first nie może być ujemny")
+    return min(first, MAKS_STRONA)
 
+def _strona(rodzaj: str, pobierz, first: int, after: Optional[str]):
+    """(krawędzie jako pary (kursor, obiekt), PageInfo) dla pobierz(po_id, limit) z repozytorium"""
+    po_id = _id_z_kursora(rodzaj, after)
+    rozmiar = _rozmiar_strony(first)
+    #o jeden więcej, żeby wiedzieć, czy jest następna strona
+    obiekty = pobierz(po_id, rozmiar + 1)
+    krawedzie = [(kursor(rodzaj, o.id), o) for o in obiekty[:rozmiar]]
+    strona = PageInfo(
+        has_next_page=len(obiekty) > rozmiar,
+        has_previous_page=after is not None,
+        start_cursor=krawedzie[0][0] if krawedzie else None,
+        end_cursor=krawedzie[-1][0] if krawedzie else None,
+    )
+    return krawedzie, strona
+
+
+#dane startowe; zapytania i mutacje idą przez repozytorium z indeksami
 studenci = [
     Student(id=1, imie="Anna", nazwisko="Kowalska", kierunek="Informatyka", rok_studiow=2),
     Student(id=2, imie="Jan", nazwisko="Nowak", kierunek="Matematyka", rok_studiow=3),
@@ -54,47 +149,119 @@ oceny = [
     Ocena(id=5, student_id=3, przedmiot_id=1, ocena=2.0, data="03-12-2025", komentarz="Niezaliczone"),
 ]
 
+repozytorium = RepozytoriumOcen(studenci, przedmioty, oceny)
+
+class Loadery:
+    """Loadery na czas jednego zapytania GraphQL.
+
+    Klucze zebrane podczas jednego kroku wykonania trafiają do funkcji
+    wsadowej naraz, która rozwiązuje je przez indeksy repozytorium, po jednym
+    odczycie słownika na klucz. Wyniki są zapamiętywane tylko do końca
+    zapytania, więc nie trzeba ich unieważniać po mutacjach.
+    """
+
+    def __init__(self):
+        self.studenci = DataLoader(load_fn=self._studenci)
+        self.oceny_studenta = DataLoader(load_fn=self._oceny_studentow)
+        self.oceny_przedmiotu = DataLoader(load_fn=self._oceny_przedmiotow)
+        self.przedmioty = DataLoader(load_fn=self._przedmioty)
+
+    @staticmethod
+    async def _studenci(ids: List[int]) -> List[Optional[Student]]:
+        return [repozytorium.student(i) for i in ids]
+
+    @staticmethod
+    async def _oceny_studentow(ids: List[int]) -> List[List[Ocena]]:
+        return [repozytorium.oceny_studenta(i) for i in ids]
+
+    @staticmethod
+    async def _oceny_przedmiotow(ids: List[int]) -> List[List[Ocena]]:
+        return [repozytorium.oceny_przedmiotu(i) for i in ids]
+
+    @staticmethod
+    async def _przedmioty(ids: List[int]) -> List[Optional[Przedmiot]]:
+        return [repozytorium.przedmiot(i) for i in ids]
+
+#loader -> metoda repozytorium dla jednego klucza, gdy zapytanie idzie bez pętli zdarzeń
+METODY_LOADEROW = {
+    "studenci": "student",
+    "oceny_studenta": "oceny_studenta",
+    "oceny_przedmiotu": "oceny_przedmiotu",
+    "przedmioty": "przedmiot",
+}
+
+def _laduj(info: strawberry.Info, loader: str, klucz: int):
+    """Obiekt przez loader zapytania; w schemat.execute_sync (bez pętli zdarzeń) wprost z repozytorium"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return getattr(repozytorium, METODY_LOADEROW[loader])(klucz)
+    return getattr(info.context["loadery"], loader).load(klucz)
+
+def kontekst(**dodatkowe) -> dict:
+    """Kontekst dla schemat.execute(...) poza serwerem HTTP"""
+    return {"loadery": Loadery(), **dodatkowe}
+
+class LoaderyZapytania(SchemaExtension):
+    """Tworzy Loadery dla wykonania, które nie dostało ich w kontekście (np. schemat.execute(zapytanie))"""
+
+    def on_operation(self):
+        wykonanie = self.execution_context
+        if wykonanie.context is None:
+            wykonanie.context = kontekst()
+        elif isinstance(wykonanie.context, dict) and "loadery" not in wykonanie.context:
+            wykonanie.context["loadery"] = Loadery()
+        yield
+
 @strawberry.type
 class Query:
     #pobierz wszystkich stduentow
     @strawberry.field
     def studenci(self) -> List[Student]:
-        return studenci
+        return repozytorium.studenci()
     #pobierz studenta po ID
     @strawberry.field
     def student(self, id:int) -> Student:
-        for s in studenci:
-            if s.id == id:
-                return s
+        s = repozytorium.student(id)
+        if s is not None:
+            return s
 
         raise ValueError(f"Student o ID {id} nie istnieje")
+    #pobierz studentów stronami: studenciConnection(first: 50, after: "...")
+    @strawberry.field
+    def studenci_connection(self, first: int = 20, after: Optional[str] = None) -> StudentConnection:
+        krawedzie, strona = _strona("student", repozytorium.strona_studentow, first, after)
+        return StudentConnection(edges=[StudentEdge(cursor=k, node=s) for k, s in krawedzie], page_info=strona)
     #pobierz wsyztskie przedmioty
     @strawberry.field
     def przedmioty(self) -> List[Przedmiot]:
-        return przedmioty
+        return repozytorium.przedmioty()
     #pobierz oceny studenta
     @strawberry.field
     def oceny_studenta(self, student_id: int) -> List[Ocena]:
-        return [o for o in oceny if o.student_id == student_id]
+        return repozytorium.oceny_studenta(student_id)
+    #pobierz oceny studenta stronami
+    @strawberry.field
+    def oceny_connection(self, student_id: int, first: int = 20, after: Optional[str] = None) -> OcenaConnection:
+        krawedzie, strona = _strona(
+            "ocena", lambda po_id, limit: repozytorium.strona_ocen_studenta(student_id, po_id, limit), first, after)
+        return OcenaConnection(edges=[OcenaEdge(cursor=k, node=o) for k, o in krawedzie], page_info=strona)
     #pobierz statystyki studenta
     @strawberry.field
     def statystyki_studenta(self, student_id: int) -> StatystykiStudenta:
-        oceny_studenta = [o.ocena for o in oceny if o.student_id == student_id]
-        if not oceny_studenta:
+        #statystyki liczone na bieżąco przy dodawaniu i zmianie ocen - O(1)
+        agregat = repozytorium.statystyki(student_id)
+        if agregat is None:
             raise ValueError(f"Student o ID {student_id} nie ma ocen")
 
-        student = None
-        for s in studenci:
-            if s.id == student_id:
-                student = s
-                break
+        student = repozytorium.student(student_id)
 
         return StatystykiStudenta(
             student=student, #obiekt student
-            srednia_ocen=sum(oceny_studenta)/ len(oceny_studenta), #srednia ocen
-            liczba_ocen=len(oceny_studenta), #liczba ocen
-            najgorsza_ocena=min(oceny_studenta), #najgorsza ocena
-            najlepsza_ocena=max(oceny_studenta) #najlepsza ocena
+            srednia_ocen=agregat.srednia, #srednia ocen
+            liczba_ocen=agregat.liczba, #liczba ocen
+            najgorsza_ocena=agregat.najmniejsza, #najgorsza ocena
+            najlepsza_ocena=agregat.najwieksza #najlepsza ocena
         )
 
 @strawberry.type
@@ -102,51 +269,78 @@ class Mutation:
     #dodaj nowego studenta
     @strawberry.mutation
     def dodaj_studenta(self, imie: str, nazwisko: str, kierunek: str, rok_studiow: int) -> Student:
-        nowy_id = max([s.id for s in studenci])+1 if studenci else 1
         nowy_student = Student(
-            id=nowy_id,
+            id=0, #id nadaje repozytorium
             imie=imie,
             nazwisko=nazwisko,
             kierunek=kierunek,
             rok_studiow=rok_studiow,
         )
 
-        studenci.append(nowy_student)
-        return nowy_student
+        return repozytorium.dodaj_studenta(nowy_student)
     #dodaj nowa ocene
     @strawberry.mutation
     def dodaj_ocene(self, student_id: int, przedmiot_id: int, ocena: float, komentarz: str = "" ) -> Ocena:
-        if not any(s.id == student_id for s in studenci):
+        if repozytorium.student(student_id) is None:
             raise ValueError(f"Student o ID {student_id} nie istnieje")
-        if not any(p.id == przedmiot_id for p in przedmioty):
+        if repozytorium.przedmiot(przedmiot_id) is None:
             raise ValueError(f"Przedmiot o ID {przedmiot_id} nie istnieje")
 
-        nowy_id = max([o.id for o in oceny]) + 1 if oceny else 1
-
         nowa_ocena = Ocena(
-            id=nowy_id,
+            id=0, #id nadaje repozytorium
             student_id=student_id,
             przedmiot_id=przedmiot_id,
             ocena=ocena,
             data=datetime.now().strftime("%Y-%m-%d"),
             komentarz=komentarz,
         )
-        oceny.append(nowa_ocena)
-        return nowa_ocena
+        return repozytorium.dodaj_ocene(nowa_ocena)
     @strawberry.mutation
     def aktualizuj_ocene(self, ocena_id: int, nowa_ocena: float, nowy_komentarz: str = "" ) -> Ocena:
-        for o in oceny:
-            if o.id == ocena_id:
-                o.ocena = nowa_ocena
-                return o
+        o = repozytorium.aktualizuj_ocene(ocena_id, nowa_ocena)
+        if o is not None:
+            return o
         raise ValueError(f"Ocena o ID {ocena_id} nie istnieje")
 
-schemat = strawberry.Schema(query=Query, mutation=Mutation)
+#ile różnych dokumentów trzymać sparsowanych i zwalidowanych
+MAKS_DOKUMENTOW = 1000
+rejestr_zapytan = RejestrZapytan(MAKS_DOKUMENTOW)
+
+#limity zapytań: koszt to szacowana liczba obiektów do zwrócenia
+MAKS_KOSZT = int(os.environ.get("OCENY_MAKS_KOSZT", "10000"))
+MAKS_GLEBOKOSC = int(os.environ.get("OCENY_MAKS_GLEBOKOSC", "8"))
+#spodziewana liczba elementów list (pozostałe listy: DOMYSLNA_LICZNOSC)
+LICZNOSCI = {
+    ("Query", "studenci"): 100,
+    ("Query", "przedmioty"): 20,
+    ("Query", "ocenyStudenta"): 20,
+    ("Student", "oceny"): 20,
+    ("Przedmiot", "oceny"): 100,
+    #first podane zmienną: liczymy jak największą stronę
+    ("StudentConnection", "edges"): MAKS_STRONA,
+    ("OcenaConnection", "edges"): MAKS_STRONA,
+}
+#first ponad MAKS_STRONA i tak daje najwyżej MAKS_STRONA elementów
+analizator_kosztu = AnalizatorKosztu(LICZNOSCI, maks_dokumentow=MAKS_DOKUMENTOW, maks_licznosc=MAKS_STRONA)
+
+schemat = strawberry.Schema(query=Query, mutation=Mutation, extensions=[
+    LoaderyZapytania,
+    lambda: UtrwaloneZapytania(rejestr_zapytan),
+    lambda: ParserCache(maxsize=MAKS_DOKUMENTOW),
+    lambda: ValidationCache(maxsize=MAKS_DOKUMENTOW),
+    lambda: LimitKosztu(analizator_kosztu, MAKS_KOSZT, MAKS_GLEBOKOSC),
+])
+
+class GraphQLOceny(GraphQL):
+    """Serwer ASGI, który każdemu zapytaniu daje świeże loadery"""
+
+    async def get_context(self, request, response) -> dict:
+        return kontekst(request=request, response=response)
+
+app = GraphQLOceny(schemat)
 
 if __name__ == '__main__':
-    from strawberry.asgi import GraphQL
     from uvicorn import run
-    app = GraphQL(schemat)
 
     print("SCHEMAT OCEN STUDENTÓW - GraphQL")
     print("Serwer działa na: http://127.0.0.1:8002")
@@ -157,10 +351,15 @@ if __name__ == '__main__':
     print("3. przedmioty - Pobierz przedmioty")
     print("4. ocenyStudenta(studentId: 1) - Pobierz oceny")
     print("5. statystykiStudenta(studentId: 1) - Pobierz statystyki")
+    print("6. studenciConnection(first: 20, after: ...) - Studenci stronami")
+    print("7. ocenyConnection(studentId: 1, first: 20, after: ...) - Oceny stronami")
+    print("   studenci { oceny { ocena przedmiot { nazwa } } } - Zagnieżdżone pola")
 
     print("\nDostępne mutacje (Mutation):")
     print("1. dodajStudenta(..) - Dodaj studenta")
     print("2. dodajOcene(..) - Dodaj ocene")
     print("3. aktualizuj_ocene(..) - Aktualizuj ocene")
+    print("\nZapytania utrwalone: extensions.persistedQuery.sha256Hash zamiast pełnego tekstu")
+    print(f"Limity zapytań: koszt {MAKS_KOSZT}, głębokość {MAKS_GLEBOKOSC} (OCENY_MAKS_KOSZT, OCENY_MAKS_GLEBOKOSC)")
 
     run(app, host="127.0.0.1", port=8002)
@@ -0,0 +1,62 @@
+import sys
+import threading
+from collections import OrderedDict
+
+# przybliżony narzut OrderedDict na jeden wpis (węzeł listy + slot w tablicy haszującej)
+NARZUT_WPISU = 100
+
+
+def _rozmiar(klucz, wartosc) -> int:
+    return (NARZUT_WPISU + sys.getsizeof(klucz) + sum(sys.getsizeof(k) for k in klucz)
+            + sys.getsizeof(wartosc))
+
+
+class PamiecWynikow:
+    """Pamięć podręczna LRU dla wyników operacji, ograniczona liczbą wpisów i bajtami"""
+
+    def __init__(self, maks_wpisow: int = 100_000, maks_bajtow: int = 32 * 1024 * 1024):
+        self.maks_wpisow = maks_wpisow
+        self.maks_bajtow = maks_bajtow
+        self._wpisy = OrderedDict()
+        self._bajty = 0
+        self._blokada = threading.Lock()
+        self.trafienia = 0
+        self.chybienia = 0
+
+    def pobierz_lub_oblicz(self, klucz: tuple, funkcja):
+        """Zwróć zapamiętany wynik albo oblicz go funkcją i zapamiętaj (wyjątki nie są zapamiętywane)"""
+        with self._blokada:
+            if klucz in self._wpisy:
+                self._wpisy.move_to_end(klucz)
+                self.trafienia += 1
+                return self._wpisy[klucz]
+            self.chybienia += 1
+
+        wynik = funkcja()
+
+        with self._blokada:
+            if klucz not in self._wpisy:
+                self._wpisy[klucz] = wynik
+                self._bajty += _rozmiar(klucz, wynik)
+                while len(self._wpisy) > self.maks_wpisow or self._bajty > self.maks_bajtow:
+                    stary_klucz, stara_wartosc = self._wpisy.popitem(last=False)
+                    self._bajty -= _rozmiar(stary_klucz, stara_wartosc)
+        return wynik
+
+    def wyczysc(self):
+        with self._blokada:
+            self._wpisy.clear()
+            self._bajty = 0
+
+    def metryki(self) -> dict:
+        with self._blokada:
+            zapytania = self.trafienia + self.chybienia
+            return {
+                "trafienia": self.trafienia,
+                "chybienia": self.chybienia,
+                "skuteczność": self.trafienia / zapytania if zapytania else 0.0,
+                "wpisy": len(self._wpisy),
+                "bajty": self._bajty,
+                "maks wpisów": self.maks_wpisow,
+                "maks bajtów": self.maks_bajtow,
+            }
@@ -0,0 +1,135 @@
+import decimal
+import math
+import operator
+from fractions import Fraction
+from functools import lru_cache
+
+TRYBY = ("float", "decimal", "ulamek")
+DOMYSLNA_PRECYZJA = 28
+MAKS_PRECYZJA = 1000
+MAKS_WYKLADNIK = 1000
+MAKS_BITOW_WYNIKU = 10_000
+
+
+class BladPrecyzji(ValueError):
+    """Niepoprawna liczba, tryb albo operacja w trybie dokładnym"""
+
+
+@lru_cache(maxsize=64)
+def kontekst(precyzja: int) -> decimal.Context:
+    """Kontekst Decimal dla danej precyzji (tworzony raz i trzymany w pamięci)"""
+    if not 1 <= precyzja <= MAKS_PRECYZJA:
+        raise BladPrecyzji(f"Precyzja musi być z zakresu 1..{MAKS_PRECYZJA}")
+    return decimal.Context(
+        prec=precyzja,
+        traps=[decimal.InvalidOperation, decimal.DivisionByZero, decimal.Overflow],
+    )
+
+
+def _sprawdz_wykladnik(b):
+    if abs(b) > MAKS_WYKLADNIK:
+        raise BladPrecyzji(f"Wykładnik większy niż {MAKS_WYKLADNIK}")
+
+
+def _dec_podziel(ctx, a, b):
+    if b == 0:
+        raise BladPrecyzji("Nie można dzielić przez 0!")
+    return ctx.divide(a, b)
+
+def _dec_potega(ctx, a, b):
+    _sprawdz_wykladnik(b)
+    return ctx.power(a, b)
+
+def _dec_pierwiastek(ctx, a, b):
+    if a < 0:
+        raise BladPrecyzji("Nie można obliczyć pierwiastka z liczby ujemnej")
+    return ctx.sqrt(a)
+
+
+def _ul_podziel(a, b):
+    if b == 0:
+        raise BladPrecyzji("Nie można dzielić przez 0!")
+    return a / b
+
+def _ul_potega(a, b):
+    if b.denominator != 1:
+        raise BladPrecyzji("W trybie ułamków wykładnik musi być liczbą całkowitą")
+    _sprawdz_wykladnik(b)
+    if a == 0 and b < 0:
+        raise BladPrecyzji("Nie można dzielić przez 0!")
+    # licznik i mianownik wyniku mają do |b| razy więcej bitów niż podstawa
+    if max(a.numerator.bit_length(), a.denominator.bit_length()) * abs(b) > MAKS_BITOW_WYNIKU:
+        raise BladPrecyzji("Wynik potęgowania jest za duży")
+    return a ** int(b)
+
+def _ul_pierwiastek(a, b):
+    if a < 0:
+        raise BladPrecyzji("Nie można obliczyć pierwiastka z liczby ujemnej")
+    licznik, mianownik = math.isqrt(a.numerator), math.isqrt(a.denominator)
+    if licznik * licznik != a.numerator or mianownik * mianownik != a.denominator:
+        raise BladPrecyzji("Pierwiastek nie jest liczbą wymierną, użyj trybu decimal")
+    return Fraction(licznik, mianownik)
+
+
+@lru_cache(maxsize=64)
+def arytmetyka(tryb: str, precyzja: int = DOMYSLNA_PRECYZJA) -> dict:
+    """Słownik operacji dla trybu dokładnego: nazwa operacji -> funkcja(a, b)
+
+    Klucz "liczba" zamienia tekst liczby na typ danego trybu.
+    """
+    if tryb == "decimal":
+        ctx = kontekst(precyzja)
+        return {
+            "liczba": lambda tekst: ctx.create_decimal(tekst),
+            "dodaj": ctx.add,
+            "odejmij": ctx.subtract,
+            "pomnoz": ctx.multiply,
+            "podziel": lambda a, b: _dec_podziel(ctx, a, b),
+            "potega": lambda a, b: _dec_potega(ctx, a, b),
+            "pierwiastek": lambda a, b: _dec_pierwiastek(ctx, a, b),
+            "minus": ctx.minus,
+            "plus": ctx.plus,
+        }
+    if tryb == "ulamek":
+        return {
+            "liczba": Fraction,
+            "dodaj": operator.add,
+            "odejmij": operator.sub,
+            "pomnoz": operator.mul,
+            "podziel": _ul_podziel,
+            "potega": _ul_potega,
+            "pierwiastek": _ul_pierwiastek,
+            "minus": operator.neg,
+            "plus": operator.pos,
+        }
+    raise BladPrecyzji(f"Nieznany tryb: {tryb}, dostępne: {', '.join(TRYBY)}")
+
+
+def liczba(tekst: str, tryb: str, precyzja: int = DOMYSLNA_PRECYZJA):
+    zamien = arytmetyka(tryb, precyzja)["liczba"]
+    # Fraction("1e999999999") liczyłby ogromną potęgę dziesięciu
+    if tryb == "ulamek" and "e" in tekst.lower():
+        raise BladPrecyzji(f"W trybie ułamków podaj liczbę bez wykładnika: {tekst}")
+    try:
+        wartosc = zamien(tekst)
+    except (ValueError, ArithmeticError):
+        raise BladPrecyzji(f"Niepoprawna liczba: {tekst}")
+    if tryb == "decimal" and not wartosc.is_finite():
+        raise BladPrecyzji(f"Niepoprawna liczba: {tekst}")
+    return wartosc
+
+
+def oblicz_dokladnie(op: str, a: str, b: str, tryb: str = "decimal", precyzja: int = DOMYSLNA_PRECYZJA):
+    """Wykonaj operację na liczbach podanych jako tekst, bez utraty dokładności floata"""
+    operacje = arytmetyka(tryb, precyzja)
+    if op not in operacje or op in ("liczba", "minus", "plus"):
+        raise BladPrecyzji(f"Nieznana operacja: {op}")
+    try:
+        return operacje[op](liczba(a, tryb, precyzja), liczba(b, tryb, precyzja))
+    except decimal.DecimalException as e:
+        raise BladPrecyzji(f"Błąd obliczeń: {type(e).__name__}")
+
+
+def na_tekst(wartosc) -> str:
+    """Wynik trybu dokładnego jako tekst (JSON nie ma typu dla Decimal/Fraction)"""
+    return str(wartosc)
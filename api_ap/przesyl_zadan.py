@@ -0,0 +1,106 @@
+import csv
+import io
+import json
+
+MAKS_DLUGOSC_WIERSZA = 1024 * 1024
+KOLUMNY_CSV = ("id", "tytul", "opis", "zrobione")
+
+
+class BladWiersza(ValueError):
+    """Wiersza importu nie da się zamienić na zadanie"""
+
+
+async def linie(strumien):
+    """Podziel strumień bajtów (np. request.stream()) na linie tekstu, kawałek po kawałku"""
+    reszta = b""
+    async for kawalek in strumien:
+        reszta += kawalek
+        *pelne, reszta = reszta.split(b"\n")
+        for linia in pelne:
+            yield linia.decode("utf-8") + "\n"
+        if len(reszta) > MAKS_DLUGOSC_WIERSZA:
+            raise BladWiersza(f"Wiersz dłuższy niż {MAKS_DLUGOSC_WIERSZA} bajtów")
+    if reszta:
+        yield reszta.decode("utf-8")
+
+
+def _na_bool(wartosc) -> bool:
+    if isinstance(wartosc, bool):
+        return wartosc
+    return str(wartosc).strip().lower() in ("1", "true", "tak")
+
+
+def _zadanie(dane: dict) -> tuple:
+    tytul = dane.get("tytul")
+    if not isinstance(tytul, str) or not tytul:
+        raise BladWiersza("Brak pola tytul")
+    opis = dane.get("opis") or ""
+    return tytul, str(opis), _na_bool(dane.get("zrobione", False))
+
+
+def z_ndjson(linia: str):
+    """Jedna linia NDJSON -> (tytul, opis, zrobione), None dla pustej linii"""
+    if not linia.strip():
+        return None
+    try:
+        dane = json.loads(linia)
+    except ValueError:
+        raise BladWiersza("Niepoprawny JSON")
+    if not isinstance(dane, dict):
+        raise BladWiersza("Wiersz musi być obiektem JSON")
+    return _zadanie(dane)
+
+
+class CzytnikCSV:
+    """CSV z nagłówkiem (co najmniej kolumna tytul) podawany linia po linii.
+
+    Pole w cudzysłowie może zawierać znak nowej linii, dlatego linie są
+    sklejane, dopóki liczba cudzysłowów w rekordzie nie będzie parzysta.
+    """
+
+    def __init__(self):
+        self.naglowek = None
+        self._rekord = ""
+
+    def dodaj_linie(self, linia: str):
+        """Zwróć (tytul, opis, zrobione) dla pełnego rekordu, None gdy rekord jeszcze trwa"""
+        self._rekord += linia
+        if self._rekord.count('"') % 2:
+            if len(self._rekord) > MAKS_DLUGOSC_WIERSZA:
+                raise BladWiersza(f"Rekord dłuższy niż {MAKS_DLUGOSC_WIERSZA} znaków")
+            return None
+        rekord, self._rekord = self._rekord, ""
+        if not rekord.strip():
+            return None
+        pola = next(csv.reader([rekord]))
+        if self.naglowek is None:
+            self.naglowek = [p.strip() for p in pola]
+            if "tytul" not in self.naglowek:
+                raise BladWiersza("Nagłówek CSV musi zawierać kolumnę tytul")
+            return None
+        return _zadanie(dict(zip(self.naglowek, pola)))
+
+    def zakoncz(self):
+        """Sprawdź, czy strumień nie urwał się w środku pola w cudzysłowie"""
+        if self._rekord.strip():
+            self._rekord = ""
+            raise BladWiersza("Niezamknięty cudzysłów na końcu pliku")
+
+
+def wiersze_csv(zadania, rozmiar_partii: int = 1000):
+    """Zadania jako tekst CSV z nagłówkiem, wysyłany partiami"""
+    bufor = io.StringIO()
+    pisarz = csv.writer(bufor, lineterminator="\n")
+    pisarz.writerow(KOLUMNY_CSV)
+    for numer, zadanie in enumerate(zadania, 1):
+        pisarz.writerow((zadanie.id, zadanie.tytul, zadanie.opis, int(zadanie.zrobione)))
+        if numer % rozmiar_partii == 0:
+            yield bufor.getvalue()
+            bufor.seek(0)
+            bufor.truncate()
+    yield bufor.getvalue()
+
+
+def wiersze_ndjson(zadania):
+    for zadanie in zadania:
+        yield zadanie.jako_json() + "\n"
@@ -0,0 +1,163 @@
+import bisect
+import threading
+
+
+class Agregat:
+    """Bieżące statystyki ocen jednego studenta, aktualizowane przy każdej zmianie.
+
+    Licznik wystąpień każdej wartości pozwala zdjąć ocenę bez przeliczania
+    wszystkiego od nowa; najmniejsza i największa są szukane ponownie tylko
+    wtedy, gdy zniknie ostatnia ocena o skrajnej wartości (a różnych wartości
+    w skali ocen jest kilka).
+    """
+
+    __slots__ = ("suma", "liczba", "licznik", "najmniejsza", "najwieksza")
+
+    def __init__(self):
+        self.suma = 0.0
+        self.liczba = 0
+        self.licznik = {}
+        self.najmniejsza = None
+        self.najwieksza = None
+
+    def dodaj(self, wartosc: float):
+        self.suma += wartosc
+        self.liczba += 1
+        self.licznik[wartosc] = self.licznik.get(wartosc, 0) + 1
+        if self.najmniejsza is None or wartosc < self.najmniejsza:
+            self.najmniejsza = wartosc
+        if self.najwieksza is None or wartosc > self.najwieksza:
+            self.najwieksza = wartosc
+
+    def usun(self, wartosc: float):
+        self.suma -= wartosc
+        self.liczba -= 1
+        pozostalo = self.licznik[wartosc] - 1
+        if pozostalo:
+            self.licznik[wartosc] = pozostalo
+            return
+        del self.licznik[wartosc]
+        if wartosc == self.najmniejsza:
+            self.najmniejsza = min(self.licznik, default=None)
+        if wartosc == self.najwieksza:
+            self.najwieksza = max(self.licznik, default=None)
+
+    @property
+    def srednia(self) -> float:
+        return self.suma / self.liczba
+
+
+class RepozytoriumOcen:
+    """Studenci, przedmioty i oceny w pamięci, z indeksami po id.
+
+    Oceny są dodatkowo zebrane w listach per student i per przedmiot, a dla
+    każdego studenta trzymany jest Agregat, więc sprawdzenie istnienia,
+    pobranie ocen studenta i statystyki kosztują O(1) niezależnie od liczby
+    ocen. Posortowane id studentów i listy ocen (rosnąco po id) pozwalają
+    pobrać stronę wyników w O(log n + rozmiar strony). Obiekty (typy
+    strawberry z oceny_graphql) są przechowywane tak, jak zostały podane;
+    id nowym nadaje repozytorium.
+    """
+
+    def __init__(self, studenci=(), przedmioty=(), oceny=()):
+        self._studenci = {}
+        self._kolejnosc_studentow = []
+        self._przedmioty = {}
+        self._oceny = {}
+        self._po_studencie = {}
+        self._po_przedmiocie = {}
+        self._agregaty = {}
+        self._nastepne_id_studenta = 1
+        self._nastepne_id_oceny = 1
+        self._blokada = threading.RLock()
+        for student in studenci:
+            self._wstaw_studenta(student)
+        for przedmiot in przedmioty:
+            self._przedmioty[przedmiot.id] = przedmiot
+        for ocena in oceny:
+            self._wstaw_ocene(ocena)
+        #dane startowe mogą przyjść w dowolnej kolejności, nowe id zawsze rosną
+        for lista in (*self._po_studencie.values(), *self._po_przedmiocie.values()):
+            lista.sort(key=lambda o: o.id)
+
+    def _wstaw_studenta(self, student):
+        self._studenci[student.id] = student
+        if self._kolejnosc_studentow and student.id < self._kolejnosc_studentow[-1]:
+            bisect.insort(self._kolejnosc_studentow, student.id)
+        else:
+            self._kolejnosc_studentow.append(student.id)
+        self._nastepne_id_studenta = max(self._nastepne_id_studenta, student.id + 1)
+
+    def _wstaw_ocene(self, ocena):
+        self._oceny[ocena.id] = ocena
+        self._nastepne_id_oceny = max(self._nastepne_id_oceny, ocena.id + 1)
+        self._po_studencie.setdefault(ocena.student_id, []).append(ocena)
+        self._po_przedmiocie.setdefault(ocena.przedmiot_id, []).append(ocena)
+        agregat = self._agregaty.get(ocena.student_id)
+        if agregat is None:
+            agregat = self._agregaty[ocena.student_id] = Agregat()
+        agregat.dodaj(ocena.ocena)
+
+    def studenci(self) -> list:
+        return list(self._studenci.values())
+
+    def przedmioty(self) -> list:
+        return list(self._przedmioty.values())
+
+    def student(self, id_studenta: int):
+        return self._studenci.get(id_studenta)
+
+    def przedmiot(self, id_przedmiotu: int):
+        return self._przedmioty.get(id_przedmiotu)
+
+    def ocena(self, id_oceny: int):
+        return self._oceny.get(id_oceny)
+
+    def oceny_studenta(self, id_studenta: int) -> list:
+        return list(self._po_studencie.get(id_studenta, ()))
+
+    def oceny_przedmiotu(self, id_przedmiotu: int) -> list:
+        return list(self._po_przedmiocie.get(id_przedmiotu, ()))
+
+    def strona_studentow(self, po_id: int = 0, limit: int = 100) -> list:
+        """Najwyżej `limit` studentów o id większym niż `po_id`, rosnąco po id"""
+        start = bisect.bisect_right(self._kolejnosc_studentow, po_id)
+        return [self._studenci[i] for i in self._kolejnosc_studentow[start:start + limit]]
+
+    def strona_ocen_studenta(self, id_studenta: int, po_id: int = 0, limit: int = 100) -> list:
+        """Najwyżej `limit` ocen studenta o id większym niż `po_id`, rosnąco po id"""
+        oceny = self._po_studencie.get(id_studenta, [])
+        start = bisect.bisect_right(oceny, po_id, key=lambda o: o.id)
+        return oceny[start:start + limit]
+
+    def statystyki(self, id_studenta: int):
+        """Agregat ocen studenta albo None, gdy nie ma on żadnej oceny"""
+        agregat = self._agregaty.get(id_studenta)
+        if agregat is None or agregat.liczba == 0:
+            return None
+        return agregat
+
+    def dodaj_studenta(self, student):
+        """Zapisz studenta pod kolejnym wolnym id (nadpisuje student.id)"""
+        with self._blokada:
+            student.id = self._nastepne_id_studenta
+            self._wstaw_studenta(student)
+        return student
+
+    def dodaj_ocene(self, ocena):
+        """Zapisz ocenę pod kolejnym wolnym id (nadpisuje ocena.id) i zaktualizuj statystyki"""
+        with self._blokada:
+            ocena.id = self._nastepne_id_oceny
+            self._wstaw_ocene(ocena)
+        return ocena
+
+    def aktualizuj_ocene(self, id_oceny: int, nowa_ocena: float):
+        """Zmień wartość oceny, zwróć ją albo None, gdy nie istnieje"""
+        with self._blokada:
+            ocena = self._oceny.get(id_oceny)
+            if ocena is not None:
+                agregat = self._agregaty[ocena.student_id]
+                agregat.usun(ocena.ocena)
+                agregat.dodaj(nowa_ocena)
+                ocena.ocena = nowa_ocena
+        return ocena
@@ -0,0 +1,237 @@
+import sqlite3
+import threading
+
+from repozytorium_zadan import JUZ_ZROBIONE, NIE_ZNALEZIONO, USUNIETE, ZROBIONE, Zadanie
+
+# stałe teksty zapytań: moduł sqlite3 trzyma skompilowane zapytania w pamięci
+# podręcznej połączenia (cached_statements), więc każde jest przygotowywane raz
+SCHEMAT = """
+CREATE TABLE IF NOT EXISTS zadania (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tytul TEXT NOT NULL,
+    opis TEXT NOT NULL,
+    zrobione INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS zadania_zrobione ON zadania (zrobione, id);
+
+-- licznik zmian wspólny dla wszystkich procesów, podbijany przez wyzwalacze
+CREATE TABLE IF NOT EXISTS wersja (id INTEGER PRIMARY KEY CHECK (id = 1), numer INTEGER NOT NULL);
+INSERT OR IGNORE INTO wersja VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS zadania_wersja_insert AFTER INSERT ON zadania
+BEGIN UPDATE wersja SET numer = numer + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS zadania_wersja_update AFTER UPDATE ON zadania
+BEGIN UPDATE wersja SET numer = numer + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS zadania_wersja_delete AFTER DELETE ON zadania
+BEGIN UPDATE wersja SET numer = numer + 1 WHERE id = 1; END;
+"""
+SQL_DODAJ = "INSERT INTO zadania (tytul, opis, zrobione) VALUES (?, ?, ?)"
+SQL_POBIERZ = "SELECT id, tytul, opis, zrobione FROM zadania WHERE id = ?"
+SQL_OZNACZ = "UPDATE zadania SET zrobione = 1 WHERE id = ? AND zrobione = 0"
+SQL_OSTATNIE_ID = "SELECT seq FROM sqlite_sequence WHERE name = 'zadania'"
+SQL_USUN = "DELETE FROM zadania WHERE id = ?"
+SQL_LICZBA = "SELECT COUNT(*) FROM zadania"
+SQL_CZY_SA = "SELECT EXISTS (SELECT 1 FROM zadania)"
+SQL_WERSJA = "SELECT numer FROM wersja WHERE id = 1"
+SQL_WSZYSTKIE = "SELECT id, tytul, opis, zrobione FROM zadania ORDER BY id"
+SQL_FILTRUJ = "SELECT id, tytul, opis, zrobione FROM zadania WHERE zrobione = ? ORDER BY id"
+SQL_STRONA = "SELECT id, tytul, opis, zrobione FROM zadania WHERE id > ? ORDER BY id LIMIT ?"
+# zapytania o wiele id idą paczkami o stałej długości listy IN (...), żeby trafiać w cache
+ROZMIAR_PACZKI_ID = 500
+SQL_POBIERZ_WIELE = "SELECT id, tytul, opis, zrobione FROM zadania WHERE id IN ({})"
+
+
+def _zadanie(wiersz) -> Zadanie:
+    return Zadanie(wiersz[0], wiersz[1], wiersz[2], bool(wiersz[3]))
+
+
+class RepozytoriumSQLite:
+    """Zadania w bazie SQLite, współdzielone przez wszystkie workery uvicorna.
+
+    Ma te same metody co RepozytoriumZadan. Każdy wątek dostaje własne,
+    trwałe połączenie (tryb WAL: czytelnicy nie blokują piszącego).
+    Zapisy z jednego procesu idą pod blokadą razem z powiadomieniem
+    obserwatorów, żeby widzieli zmiany w kolejności zatwierdzania.
+    """
+
+    def __init__(self, sciezka: str):
+        self.sciezka = sciezka
+        self._lokalne = threading.local()
+        self._obserwatorzy = []
+        self._blokada = threading.Lock()
+        self._polaczenie().executescript(SCHEMAT)
+
+    def wersja(self) -> int:
+        """Licznik zmian w bazie, także tych zrobionych przez inne procesy"""
+        return self._polaczenie().execute(SQL_WERSJA).fetchone()[0]
+
+    def obserwuj(self, funkcja):
+        """Wywołuj funkcja(rodzaj, zadanie) po każdej zmianie z tego procesu (rodzaj: dodane, zrobione, usuniete)"""
+        self._obserwatorzy.append(funkcja)
+
+    def _powiadom(self, rodzaj: str, zadanie: Zadanie):
+        for funkcja in self._obserwatorzy:
+            funkcja(rodzaj, zadanie)
+
+    def _polaczenie(self) -> sqlite3.Connection:
+        polaczenie = getattr(self._lokalne, "polaczenie", None)
+        if polaczenie is None:
+            polaczenie = sqlite3.connect(self.sciezka, isolation_level=None, cached_statements=256,
+                                         check_same_thread=False)
+            polaczenie.execute("PRAGMA journal_mode=WAL")
+            polaczenie.execute("PRAGMA synchronous=NORMAL")
+            polaczenie.execute("PRAGMA busy_timeout=5000")
+            self._lokalne.polaczenie = polaczenie
+        return polaczenie
+
+    def __len__(self):
+        return self._polaczenie().execute(SQL_LICZBA).fetchone()[0]
+
+    def dodaj(self, tytul: str, opis: str, zrobione: bool = False) -> Zadanie:
+        with self._blokada:
+            kursor = self._polaczenie().execute(SQL_DODAJ, (tytul, opis, int(zrobione)))
+            zadanie = Zadanie(kursor.lastrowid, tytul, opis, zrobione)
+            self._powiadom("dodane", zadanie)
+        return zadanie
+
+    def dodaj_wiele(self, zadania, tylko_do_pustego: bool = False) -> int:
+        """Dodaj wiele krotek (tytul, opis, zrobione) jedną transakcją przez executemany.
+
+        Z tylko_do_pustego=True nic nie dodaje, jeśli w bazie są już zadania;
+        sprawdzenie idzie w tej samej transakcji, więc kilka workerów
+        startujących naraz nie wstawi danych dwa razy.
+        """
+        wiersze = [(t, o, int(z)) for t, o, z in zadania]
+        polaczenie = self._polaczenie()
+        with self._blokada:
+            # IMMEDIATE: od początku trzymamy blokadę zapisu, więc nowe id idą po kolei
+            polaczenie.execute("BEGIN IMMEDIATE")
+            try:
+                if tylko_do_pustego and polaczenie.execute(SQL_CZY_SA).fetchone()[0]:
+                    wiersze = []
+                ostatnie = polaczenie.execute(SQL_OSTATNIE_ID).fetchone()
+                pierwsze_id = (ostatnie[0] if ostatnie else 0) + 1
+                polaczenie.executemany(SQL_DODAJ, wiersze)
+                polaczenie.execute("COMMIT")
+            except BaseException:
+                polaczenie.execute("ROLLBACK")
+                raise
+            if self._obserwatorzy:
+                for id_zadania, (tytul, opis, zrobione) in enumerate(wiersze, pierwsze_id):
+                    self._powiadom("dodane", Zadanie(id_zadania, tytul, opis, bool(zrobione)))
+        return len(wiersze)
+
+    def pobierz(self, id_zadania: int):
+        wiersz = self._polaczenie().execute(SQL_POBIERZ, (id_zadania,)).fetchone()
+        return _zadanie(wiersz) if wiersz is not None else None
+
+    def oznacz_zrobione(self, id_zadania: int):
+        polaczenie = self._polaczenie()
+        with self._blokada:
+            # zmiana i odczyt w jednej transakcji: inny proces nie usunie zadania pomiędzy nimi
+            polaczenie.execute("BEGIN IMMEDIATE")
+            try:
+                zmienione = polaczenie.execute(SQL_OZNACZ, (id_zadania,)).rowcount
+                wiersz = polaczenie.execute(SQL_POBIERZ, (id_zadania,)).fetchone()
+                polaczenie.execute("COMMIT")
+            except BaseException:
+                polaczenie.execute("ROLLBACK")
+                raise
+            if wiersz is None:
+                return None
+            zadanie = _zadanie(wiersz)
+            if zmienione:
+                self._powiadom("zrobione", zadanie)
+        return zadanie
+
+    def usun(self, id_zadania: int):
+        polaczenie = self._polaczenie()
+        with self._blokada:
+            polaczenie.execute("BEGIN IMMEDIATE")
+            try:
+                wiersz = polaczenie.execute(SQL_POBIERZ, (id_zadania,)).fetchone()
+                if wiersz is not None:
+                    polaczenie.execute(SQL_USUN, (id_zadania,))
+                polaczenie.execute("COMMIT")
+            except BaseException:
+                polaczenie.execute("ROLLBACK")
+                raise
+            if wiersz is None:
+                return None
+            zadanie = _zadanie(wiersz)
+            self._powiadom("usuniete", zadanie)
+        return zadanie
+
+    def _wiersze_po_id(self, polaczenie, ids) -> dict:
+        wiersze = {}
+        for start in range(0, len(ids), ROZMIAR_PACZKI_ID):
+            paczka = ids[start:start + ROZMIAR_PACZKI_ID]
+            sql = SQL_POBIERZ_WIELE.format(",".join("?" * len(paczka)))
+            for wiersz in polaczenie.execute(sql, paczka):
+                wiersze[wiersz[0]] = wiersz
+        return wiersze
+
+    def _zmien_wiele(self, ids, sql: str, zmien) -> tuple:
+        """Wspólna część operacji na wielu zadaniach: jedna transakcja, executemany.
+
+        zmien(wiersz) zwraca wynik dla istniejącego zadania i to, czy trzeba
+        wykonać na nim `sql`. Zwraca (pary (id, wynik), zmienione wiersze).
+        Wołający trzyma już self._blokada.
+        """
+        ids = list(dict.fromkeys(ids))
+        polaczenie = self._polaczenie()
+        polaczenie.execute("BEGIN IMMEDIATE")
+        try:
+            wiersze = self._wiersze_po_id(polaczenie, ids)
+            wyniki = []
+            zmienione = []
+            for id_zadania in ids:
+                wiersz = wiersze.get(id_zadania)
+                if wiersz is None:
+                    wyniki.append((id_zadania, NIE_ZNALEZIONO))
+                    continue
+                wynik, do_zmiany = zmien(wiersz)
+                wyniki.append((id_zadania, wynik))
+                if do_zmiany:
+                    zmienione.append(wiersz)
+            polaczenie.executemany(sql, [(w[0],) for w in zmienione])
+            polaczenie.execute("COMMIT")
+        except BaseException:
+            polaczenie.execute("ROLLBACK")
+            raise
+        return wyniki, zmienione
+
+    def oznacz_wiele_zrobione(self, ids) -> list:
+        """Oznacz wiele zadań jedną transakcją, zwróć pary (id, wynik)"""
+        with self._blokada:
+            wyniki, zmienione = self._zmien_wiele(
+                ids, SQL_OZNACZ, lambda w: (JUZ_ZROBIONE, False) if w[3] else (ZROBIONE, True))
+            for wiersz in zmienione:
+                self._powiadom("zrobione", Zadanie(wiersz[0], wiersz[1], wiersz[2], True))
+        return wyniki
+
+    def usun_wiele(self, ids) -> list:
+        """Usuń wiele zadań jedną transakcją, zwróć pary (id, wynik)"""
+        with self._blokada:
+            wyniki, usuniete = self._zmien_wiele(ids, SQL_USUN, lambda w: (USUNIETE, True))
+            for wiersz in usuniete:
+                self._powiadom("usuniete", _zadanie(wiersz))
+        return wyniki
+
+    def wszystkie(self) -> list:
+        return [_zadanie(w) for w in self._polaczenie().execute(SQL_WSZYSTKIE)]
+
+    def filtruj(self, zrobione: bool) -> list:
+        return [_zadanie(w) for w in self._polaczenie().execute(SQL_FILTRUJ, (int(zrobione),))]
+
+    def strona(self, po_id: int = 0, limit: int = 100) -> list:
+        """Najwyżej `limit` zadań o id większym niż `po_id`, rosnąco po id"""
+        return [_zadanie(w) for w in self._polaczenie().execute(SQL_STRONA, (po_id, limit))]
+
+    def iteruj(self, po_id: int = 0, rozmiar_strony: int = 1000):
+        """Leniwie przejdź po zadaniach stronami, bez kopiowania całej tabeli"""
+        while True:
+            strona = self.strona(po_id, rozmiar_strony)
+            yield from strona
+            if len(strona) < rozmiar_strony:
+                return
+            po_id = strona[-1].id
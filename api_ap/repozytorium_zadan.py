@@ -0,0 +1,197 @@
+import bisect
+import json
+import sys
+import threading
+
+_tekst_json = json.JSONEncoder(ensure_ascii=False).encode
+
+# od tylu usuwanych naraz zadań taniej przebudować listy id niż usuwać z nich po kolei
+PRZEBUDOWA_OD = 64
+
+# wyniki operacji na wielu zadaniach, dla każdego id osobno
+ZROBIONE = "zrobione"
+JUZ_ZROBIONE = "już zrobione"
+USUNIETE = "usuniete"
+NIE_ZNALEZIONO = "nie znaleziono"
+
+
+def _usun_z_posortowanej(lista: list, wartosc):
+    """Usuń wartość z posortowanej listy (wyszukiwanie binarne)"""
+    indeks = bisect.bisect_left(lista, wartosc)
+    if indeks < len(lista) and lista[indeks] == wartosc:
+        del lista[indeks]
+
+
+class Zadanie:
+    # bez __dict__ na każdym obiekcie - przy milionach zadań to większość pamięci
+    __slots__ = ("id", "tytul", "opis", "zrobione")
+
+    def __init__(self, id: int, tytul: str, opis: str, zrobione: bool = False):
+        self.id = id
+        # powtarzające się tytuły (np. z importów) współdzielą jeden obiekt str
+        self.tytul = sys.intern(tytul)
+        self.opis = opis
+        self.zrobione = zrobione
+
+    def jako_slownik(self) -> dict:
+        """Słownik do odpowiedzi JSON (zamiast vars(), które nie działa ze __slots__)"""
+        return {"id": self.id, "tytul": self.tytul, "opis": self.opis, "zrobione": self.zrobione}
+
+    def jako_json(self) -> str:
+        """Gotowy tekst JSON, składany bez pośredniego słownika (do strumieni NDJSON)"""
+        return (f'{{"id": {self.id}, "tytul": {_tekst_json(self.tytul)}, '
+                f'"opis": {_tekst_json(self.opis)}, "zrobione": {"true" if self.zrobione else "false"}}}')
+
+
+class RepozytoriumZadan:
+    """Zadania w pamięci z indeksem po id i po statusie.
+
+    To jeden z wymiennych magazynów dla todo_api; RepozytoriumSQLite
+    z modułu repozytorium_sqlite ma te same metody.
+
+    Pobranie i dodanie kosztują O(1), oznaczenie i usunięcie O(log n)
+    (wyszukiwanie w posortowanej liście id statusu), a filtrowanie po statusie
+    O(liczba wyników), bo id każdego statusu są trzymane rosnąco.
+
+    Trasy synchroniczne FastAPI działają w puli wątków, więc każda zmiana
+    (razem z powiadomieniem obserwatorów) odbywa się pod jedną blokadą:
+    id się nie powtarzają, a obserwatorzy widzą zmiany w kolejności id.
+    """
+
+    def __init__(self):
+        self._po_id = {}
+        # rosnące id zadań dla każdego statusu
+        self._po_statusie = {True: [], False: []}
+        self._nastepne_id = 1
+        # rosnące id istniejących zadań, do stronicowania
+        self._kolejnosc = []
+        self._obserwatorzy = []
+        self._wersja = 0
+        self._blokada = threading.RLock()
+
+    def wersja(self) -> int:
+        """Licznik zmian: rośnie przy każdym dodaniu, oznaczeniu i usunięciu"""
+        return self._wersja
+
+    def obserwuj(self, funkcja):
+        """Wywołuj funkcja(rodzaj, zadanie) po każdej zmianie (rodzaj: dodane, zrobione, usuniete)"""
+        self._obserwatorzy.append(funkcja)
+
+    def _powiadom(self, rodzaj: str, zadanie: Zadanie):
+        self._wersja += 1
+        for funkcja in self._obserwatorzy:
+            funkcja(rodzaj, zadanie)
+
+    def __len__(self):
+        return len(self._po_id)
+
+    def dodaj(self, tytul: str, opis: str, zrobione: bool = False) -> Zadanie:
+        with self._blokada:
+            zadanie = Zadanie(self._nastepne_id, tytul, opis, zrobione)
+            self._nastepne_id += 1
+            self._po_id[zadanie.id] = zadanie
+            self._po_statusie[zadanie.zrobione].append(zadanie.id)
+            self._kolejnosc.append(zadanie.id)
+            self._powiadom("dodane", zadanie)
+        return zadanie
+
+    def dodaj_wiele(self, zadania, tylko_do_pustego: bool = False) -> int:
+        """Dodaj wiele krotek (tytul, opis, zrobione), zwróć ile dodano (id idą po kolei).
+
+        Z tylko_do_pustego=True nic nie dodaje, jeśli repozytorium nie jest puste.
+        """
+        liczba = 0
+        with self._blokada:
+            if tylko_do_pustego and self._po_id:
+                return 0
+            for tytul, opis, zrobione in zadania:
+                self.dodaj(tytul, opis, zrobione)
+                liczba += 1
+        return liczba
+
+    def pobierz(self, id_zadania: int):
+        return self._po_id.get(id_zadania)
+
+    def oznacz_zrobione(self, id_zadania: int):
+        with self._blokada:
+            zadanie = self._po_id.get(id_zadania)
+            if zadanie is not None and not zadanie.zrobione:
+                _usun_z_posortowanej(self._po_statusie[False], id_zadania)
+                zadanie.zrobione = True
+                bisect.insort(self._po_statusie[True], id_zadania)
+                self._powiadom("zrobione", zadanie)
+        return zadanie
+
+    def oznacz_wiele_zrobione(self, ids) -> list:
+        """Oznacz wiele zadań w jednym przejściu, zwróć pary (id, wynik)"""
+        wyniki = []
+        with self._blokada:
+            for id_zadania in dict.fromkeys(ids):
+                zadanie = self._po_id.get(id_zadania)
+                if zadanie is None:
+                    wyniki.append((id_zadania, NIE_ZNALEZIONO))
+                elif zadanie.zrobione:
+                    wyniki.append((id_zadania, JUZ_ZROBIONE))
+                else:
+                    self.oznacz_zrobione(id_zadania)
+                    wyniki.append((id_zadania, ZROBIONE))
+        return wyniki
+
+    def usun_wiele(self, ids) -> list:
+        """Usuń wiele zadań w jednym przejściu, zwróć pary (id, wynik).
+
+        Przy wielu id listy id są przebudowywane raz na końcu, więc całość
+        kosztuje O(n + k), a nie O(n·k).
+        """
+        wyniki = []
+        ids = list(dict.fromkeys(ids))
+        przebuduj = len(ids) > PRZEBUDOWA_OD
+        with self._blokada:
+            for id_zadania in ids:
+                usuniete = self._usun(id_zadania, z_list=not przebuduj)
+                wyniki.append((id_zadania, USUNIETE if usuniete is not None else NIE_ZNALEZIONO))
+            if przebuduj:
+                # słownik zachowuje kolejność dodania, czyli rosnące id
+                self._kolejnosc = list(self._po_id)
+                for lista in self._po_statusie.values():
+                    lista[:] = [id_zadania for id_zadania in lista if id_zadania in self._po_id]
+        return wyniki
+
+    def usun(self, id_zadania: int):
+        with self._blokada:
+            return self._usun(id_zadania, z_list=True)
+
+    def _usun(self, id_zadania: int, z_list: bool):
+        """Usuń zadanie (pod blokadą); bez z_list listy id przebudowuje wywołujący"""
+        zadanie = self._po_id.pop(id_zadania, None)
+        if zadanie is not None:
+            if z_list:
+                _usun_z_posortowanej(self._po_statusie[zadanie.zrobione], id_zadania)
+                _usun_z_posortowanej(self._kolejnosc, id_zadania)
+            self._powiadom("usuniete", zadanie)
+        return zadanie
+
+    def wszystkie(self) -> list:
+        # id rosną z każdym dodaniem, więc kolejność wstawiania to kolejność id
+        with self._blokada:
+            return list(self._po_id.values())
+
+    def filtruj(self, zrobione: bool) -> list:
+        # lista id statusu jest posortowana, więc wynik jest od razu rosnąco po id
+        with self._blokada:
+            return [self._po_id[id_zadania] for id_zadania in self._po_statusie[zrobione]]
+
+    def strona(self, po_id: int = 0, limit: int = 100) -> list:
+        """Najwyżej `limit` zadań o id większym niż `po_id`, rosnąco po id: O(log n + limit)"""
+        with self._blokada:
+            start = bisect.bisect_right(self._kolejnosc, po_id)
+            return [self._po_id[id_zadania] for id_zadania in self._kolejnosc[start:start + max(limit, 0)]]
+
+    def iteruj(self, po_id: int = 0, rozmiar_strony: int = 1000):
+        """Leniwie przejdź po zadaniach stronami, bez kopiowania całej listy"""
+        while True:
+            strona = self.strona(po_id, rozmiar_strony)
+            yield from strona
+            if len(strona) < rozmiar_strony:
+                return
+            po_id = strona[-1].id
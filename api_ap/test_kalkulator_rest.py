@@ -0,0 +1,361 @@
+import asyncio
+import errno
+import json
+import math
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+import historia_dziennik
+import historia_operacji
+import interaktywny_kalkulator_klienta
+import kalkulator_rest
+import klient_kalkulatora
+import pamiec_wynikow
+import wyrazenia
+
+
+def _niepoprawny_json(stala):
+    raise AssertionError(f"{stala} nie jest poprawnym JSON-em")
+
+
+def test_batch_bledy_elementow():
+    """Zespolony wynik, przepełnienie i zła linia NDJSON psują tylko swój element"""
+    with TestClient(kalkulator_rest.app) as klient:
+        elementy = [
+            {"op": "dodaj", "a": 1, "b": 2},
+            {"op": "potega", "a": -8, "b": 0.5},
+            {"op": "pomnoz", "a": 1e308, "b": 10},
+            {"wyrazenie": "(-8)**0.5"},
+            {"wyrazenie": "2*3"},
+        ]
+        odpowiedz = klient.post("/batch", json=elementy)
+        assert odpowiedz.status_code == 200
+        wyniki = odpowiedz.json()["wyniki"]
+        assert wyniki[0]["wynik"] == 3
+        assert all("error" in w for w in wyniki[1:4])
+        assert wyniki[4]["wynik"] == 6
+        assert odpowiedz.json()["liczba błędów"] == 3
+
+        linie = '{"op": "dodaj", "a": 1, "b": 2}\n{"op": "dodaj", "a": \n{"wyrazenie": "1+1"}\n'
+        odpowiedz = klient.post("/batch", content=linie, headers={"content-type": "application/x-ndjson"})
+        assert odpowiedz.status_code == 200
+        wyniki = odpowiedz.json()["wyniki"]
+        assert [w["indeks"] for w in wyniki] == [0, 1, 2]
+        assert wyniki[0]["wynik"] == 3 and "error" in wyniki[1] and wyniki[2]["wynik"] == 2
+
+        # za duża liczba całkowita to błąd elementu, a nie 500 dla całego batcha
+        elementy = [{"op": "dodaj", "a": 10 ** 400, "b": 1}, {"op": "dodaj", "a": 1, "b": 1}]
+        odpowiedz = klient.post("/batch", json=elementy)
+        assert odpowiedz.status_code == 200
+        wyniki = odpowiedz.json()["wyniki"]
+        assert wyniki[0]["error"] == "Pola a i b muszą być liczbami" and wyniki[1]["wynik"] == 2
+
+
+
+def test_wyrazenia_ze_spacjami():
+    """Spacje rozdzielają tokeny, a różna ich liczba trafia w ten sam wpis pamięci"""
+    with TestClient(kalkulator_rest.app) as klient:
+        assert klient.get("/oblicz/1 2").status_code == 400
+        assert klient.get("/oblicz/2 * * 3").status_code == 400
+        assert klient.get("/oblicz/2 ** 3").json()["wynik"] == 8
+
+        assert klient.get("/oblicz/ 7 + 5 ").json()["wynik"] == 12
+        trafienia = wyrazenia._kompiluj.cache_info().hits
+        assert klient.get("/oblicz/7   +%095").json()["wynik"] == 12
+        assert wyrazenia._kompiluj.cache_info().hits == trafienia + 1
+        assert wyrazenia.normalizuj("7+5") != wyrazenia.normalizuj("7 + 5")
+
+
+
+def test_wektor_przepelnienie():
+    """Przepełnienie w każdej operacji trafia do maski, a odpowiedź jest poprawnym JSON-em"""
+    with TestClient(kalkulator_rest.app) as klient:
+        for op in ("dodaj", "odejmij", "pomnoz"):
+            b = -1e308 if op == "odejmij" else 1e308
+            odpowiedz = klient.post(f"/wektor/{op}", json={"a": [1e308, 1.0], "b": [b, 2.0]})
+            dane = json.loads(odpowiedz.text, parse_constant=_niepoprawny_json)
+            assert dane["wynik"][0] is None and dane["wynik"][1] is not None
+            assert dane["maska błędów"] == [True, False]
+
+        odpowiedz = klient.post("/wektor/podziel", json={"a": [1, 1e308], "b": [0, 1e-308]}).json()
+        assert odpowiedz["maska błędów"] == [True, True] and odpowiedz["liczba błędów"] == 2
+        assert klient.post("/wektor/dodaj", json={"b": 1}).status_code == 400
+
+
+
+def test_historia_cykliczna():
+    """Bufor trzyma tylko ostatnie wpisy, także scalany z wielu wątków"""
+    historia = historia_operacji.HistoriaOperacji(3)
+    for numer in range(5):
+        historia.dodaj(f"op {numer}")
+    assert len(historia) == 3
+    assert [w["operacja"] for w in historia.ostatnie(10)] == ["op 2", "op 3", "op 4"]
+    assert [w["operacja"] for w in historia.ostatnie(1)] == ["op 4"]
+    assert historia.ostatnie(0) == []
+
+    per_watek = historia_operacji.HistoriaPerWatek(3)
+    with ThreadPoolExecutor(max_workers=2) as wykonawca:
+        list(wykonawca.map(per_watek.dodaj, [f"op {numer}" for numer in range(4)]))
+    assert len(per_watek.ostatnie(10)) == len(per_watek) == 3
+
+    # krótko żyjące wątki nie zostawiają po sobie całych buforów
+    for numer in range(50):
+        watek = threading.Thread(target=per_watek.dodaj, args=(f"wątek {numer}",))
+        watek.start()
+        watek.join()
+    assert len(per_watek) <= per_watek.rozmiar
+    assert len(per_watek._bufory) <= 2 and len(per_watek._archiwum) <= per_watek.rozmiar
+    assert [w["operacja"] for w in per_watek.ostatnie(10)][-1] == "wątek 49"
+
+    with TestClient(kalkulator_rest.app) as klient:
+        klient.get("/dodaj/2/2")
+        odpowiedz = klient.get("/historia", params={"limit": 1}).json()
+        assert odpowiedz["historia"][-1]["operacja"] == "2.0 + 2.0 = 4.0"
+
+
+
+def _czekaj(warunek, limit=5.0):
+    koniec = time.monotonic() + limit
+    while not warunek():
+        assert time.monotonic() < koniec, "przekroczony czas oczekiwania"
+        time.sleep(0.01)
+
+
+def test_dziennik_przezywa_blad_zapisu(tmp_path, monkeypatch):
+    """Błąd dysku nie zabija wątku zapisu, a wpisy czekają na kolejną próbę"""
+    dziennik = historia_dziennik.DziennikHistorii(str(tmp_path), interwal_zapisu=0.01, maks_oczekujacych=3)
+    prawdziwy_open = historia_dziennik.os.open
+
+    def pelny_dysk(*args, **kwargs):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(historia_dziennik.os, "open", pelny_dysk)
+    for numer in range(5):
+        dziennik.dodaj(f"op {numer}")
+    _czekaj(lambda: dziennik.ostatni_blad is not None)
+    assert dziennik._watek.is_alive()
+    assert len(dziennik) == 3, "bufor ograniczony do maks_oczekujacych"
+
+    monkeypatch.setattr(historia_dziennik.os, "open", prawdziwy_open)
+    _czekaj(lambda: dziennik.ostatni_blad is None and not dziennik._oczekujace)
+    dziennik.zamknij()
+    assert [w["operacja"] for w in dziennik.ostatnie(10)] == ["op 2", "op 3", "op 4"]
+
+    # nowa instancja liczy linie dopiero przy len(), i tylko nowe bajty
+    ponownie = historia_dziennik.DziennikHistorii(str(tmp_path), interwal_zapisu=60)
+    assert ponownie._policzone == {}
+    assert len(ponownie) == 3
+    ponownie.dodaj("op 5")
+    ponownie.zapisz()
+    assert len(ponownie) == 4
+    ponownie.zamknij()
+
+
+
+def test_pamiec_wynikow(monkeypatch):
+    """Wynik liczony raz, błędy nie są zapamiętywane, a najstarsze wpisy wypadają"""
+    pamiec = pamiec_wynikow.PamiecWynikow(maks_wpisow=2)
+    monkeypatch.setattr(kalkulator_rest, "pamiec", pamiec)
+    wywolania = []
+
+    def dodaj(a, b):
+        wywolania.append((a, b))
+        return a + b
+
+    monkeypatch.setitem(kalkulator_rest.OPERACJE, "dodaj", (dodaj, *kalkulator_rest.OPERACJE["dodaj"][1:]))
+
+    with TestClient(kalkulator_rest.app) as klient:
+        assert klient.get("/dodaj/1/2").json()["wynik"] == 3
+        assert klient.get("/dodaj/1/2").json()["wynik"] == 3
+        assert wywolania == [(1, 2)]
+        assert klient.get("/podziel/1/0").status_code == 400
+        assert klient.get("/podziel/1/0").status_code == 400
+        klient.get("/dodaj/3/4")
+        klient.get("/dodaj/5/6")
+
+        metryki = klient.get("/metryki").json()["pamięć wyników"]
+    assert metryki["trafienia"] == 1 and metryki["chybienia"] == 5
+    assert metryki["wpisy"] == 2
+    assert ("dodaj", 1.0, 2.0, 1.0, 1.0) not in pamiec._wpisy
+
+    # 0.0 i -0.0 są równe, ale nie mogą dzielić wpisu pamięci
+    monkeypatch.setattr(kalkulator_rest, "pamiec", pamiec_wynikow.PamiecWynikow())
+    assert math.copysign(1.0, kalkulator_rest.oblicz("pomnoz", -0.0, 1.0)) == -1.0
+    assert math.copysign(1.0, kalkulator_rest.oblicz("pomnoz", 0.0, 1.0)) == 1.0
+    assert math.copysign(1.0, kalkulator_rest.oblicz("podziel", 0.0, -5.0)) == -1.0
+    assert math.copysign(1.0, kalkulator_rest.oblicz("podziel", -0.0, -5.0)) == 1.0
+
+
+
+def test_odpowiedz_duze_liczby():
+    """Liczby całkowite spoza 64 bitów wracają poprawnie także z orjson"""
+    with TestClient(kalkulator_rest.app) as klient:
+        odpowiedz = klient.get("/oblicz/2**100")
+        assert odpowiedz.status_code == 200
+        assert odpowiedz.json()["wynik"] == 2 ** 100
+        assert klient.get("/oblicz/-(2**64)").json()["wynik"] == -2 ** 64
+        assert klient.get("/dodaj/1/2").json() == {"operacja": "dodawanie", "a": 1.0, "b": 2.0, "wynik": 3.0}
+    assert kalkulator_rest.OdpowiedzJSON({"wynik": 2 ** 70}).body == b'{"wynik":1180591620717411303424}'
+
+
+def test_obliczenia_poza_petla_zdarzen():
+    """Wyrażenia i tryby dokładne idą w puli wątków, a tanie operacje na float są async"""
+    sciezki = {trasa.path: trasa.endpoint for trasa in kalkulator_rest.app.routes}
+    for sciezka in ("/oblicz/{wyrazenie}", "/dec/{op}/{a}/{b}"):
+        assert not asyncio.iscoroutinefunction(sciezki[sciezka]), sciezka
+    for op in kalkulator_rest.OPERACJE:
+        assert asyncio.iscoroutinefunction(sciezki[f"/{op}/{{a}}/{{b}}"]) == kalkulator_rest.TRYB_SZYBKI, op
+
+
+
+def test_tryby_dokladne():
+    """Decimal i ułamki liczą dokładnie, a za duże potęgi kończą się błędem 400 od razu"""
+    with TestClient(kalkulator_rest.app) as klient:
+        assert klient.get("/dec/dodaj/0.1/0.2").json()["wynik"] == "0.3"
+        assert klient.get("/dec/podziel/1/3", params={"precyzja": 5}).json()["wynik"] == "0.33333"
+        assert klient.get("/dec/podziel/2/6", params={"tryb": "ulamek"}).json()["wynik"] == "1/3"
+        assert klient.get("/oblicz/0.5**3", params={"tryb": "ulamek"}).json()["wynik"] == "1/8"
+        assert str(wyrazenia.policz("1/3 + 1/6", "ulamek")) == "1/2"
+
+        start = time.perf_counter()
+        for wyrazenie in ("((9**1000)**1000)**10", "(((9**1000)**1000)**1000)**1000", "0.5**1000**1000"):
+            odpowiedz = klient.get(f"/oblicz/{wyrazenie}", params={"tryb": "ulamek"})
+            assert odpowiedz.status_code == 400, wyrazenie
+        assert klient.get("/dec/potega/7/1001", params={"tryb": "ulamek"}).status_code == 400
+        assert time.perf_counter() - start < 1.0
+
+
+
+def test_sesja_ws_przezywa_bledy():
+    """Zespolony wynik i zły JSON to odpowiedź z błędem, a sesja działa dalej"""
+    with TestClient(kalkulator_rest.app) as klient, klient.websocket_connect("/ws") as ws:
+        ws.send_text(json.dumps({"seq": 1, "op": "potega", "a": -8, "b": 0.5}))
+        assert ws.receive_json() == {"seq": 1, "error": "Błąd obliczeń: wynik nie jest liczbą rzeczywistą"}
+        ws.send_text("{")
+        assert "error" in ws.receive_json()
+        ws.send_text(json.dumps([{"seq": 2, "op": "dodaj", "a": 1, "b": 2}, {"seq": 3, "wyrazenie": "1e308*10"}]))
+        pierwszy, drugi = ws.receive_json()
+        assert pierwszy["wynik"] == 3 and drugi["seq"] == 3 and "error" in drugi
+
+
+def test_sesja_ws_liczy_w_puli(monkeypatch):
+    """Wiadomości /ws są liczone w puli wątków; zły element i za duża liczba to błędy elementów"""
+    w_puli = []
+    prawdziwy_run_in_threadpool = kalkulator_rest.run_in_threadpool
+
+    async def licz_w_puli(funkcja, *args):
+        w_puli.append(funkcja.__name__)
+        return await prawdziwy_run_in_threadpool(funkcja, *args)
+
+    monkeypatch.setattr(kalkulator_rest, "run_in_threadpool", licz_w_puli)
+    with TestClient(kalkulator_rest.app) as klient, klient.websocket_connect("/ws") as ws:
+        ws.send_text(json.dumps(["nie obiekt", {"op": "dodaj", "a": 10 ** 400, "b": 1}, {"op": "dodaj", "a": 1}]))
+        zly, za_duza, dobry = ws.receive_json()
+        assert zly == {"seq": 0, "error": "Element musi być obiektem JSON"}
+        assert za_duza == {"seq": 1, "error": "Pola a i b muszą być liczbami"}
+        assert dobry == {"seq": 2, "operacja": "dodawanie", "a": 1.0, "b": 0.0, "wynik": 1.0}
+        ws.send_text(json.dumps({"op": "pomnoz", "a": 2, "b": 3}))
+        assert ws.receive_json()["seq"] == 3
+    assert w_puli == ["_odpowiedz_ws", "_odpowiedz_ws"]
+
+
+class _ZerwanePolaczenie:
+    """Gniazdo, które przyjmuje `odpowiedzi` wiadomości, a potem jest zerwane"""
+
+    def __init__(self, odpowiedzi):
+        self.odpowiedzi = odpowiedzi
+        self.wyslane = []
+
+    def send(self, tekst):
+        self.wyslane.append(json.loads(tekst))
+
+    def recv(self):
+        if self.odpowiedzi == 0:
+            raise interaktywny_kalkulator_klienta.ConnectionClosed(None, None)
+        self.odpowiedzi -= 1
+        return json.dumps({"seq": self.wyslane[0]["seq"], "wynik": "z ws"})
+
+    def close(self):
+        raise OSError("gniazdo już zamknięte")
+
+
+def test_klient_wraca_do_http_po_zerwaniu(monkeypatch):
+    """Zerwany WebSocket nie przerywa pracy klienta: reszta operacji idzie zwykłym GET"""
+    kalkulator = interaktywny_kalkulator_klienta.IneraktywnyKalkulator(uzyj_ws=False)
+    zapytania = []
+
+    def wykonaj_zapytanie(endpoint):
+        zapytania.append(endpoint)
+        return {"wynik": "z http"}
+
+    monkeypatch.setattr(kalkulator, "wykonaj_zapytanie", wykonaj_zapytanie)
+
+    kalkulator.ws = _ZerwanePolaczenie(odpowiedzi=1)
+    wyniki = kalkulator.wykonaj_skrypt([{"op": "dodaj", "a": 1, "b": 2}, {"op": "pierwiastek", "a": 9},
+                                        {"wyrazenie": "2 * 3"}])
+    assert [w["wynik"] for w in wyniki] == ["z ws", "z http", "z http"]
+    assert zapytania == ["pierwiastek/9/0", "oblicz/2%20%2A%203"]
+    assert kalkulator.ws is None
+
+    assert kalkulator.wykonaj_operacje("pomnoz", 2, 5) == {"wynik": "z http"}
+    assert zapytania[-1] == "pomnoz/2/5"
+
+
+
+def _serwer_w_tle(app):
+    """Uruchom aplikację na wolnym porcie w osobnym wątku; zwraca (adres, serwer)"""
+    gniazdo = socket.socket()
+    gniazdo.bind(("127.0.0.1", 0))
+    serwer = uvicorn.Server(uvicorn.Config(app, log_level="error"))
+    threading.Thread(target=serwer.run, kwargs={"sockets": [gniazdo]}, daemon=True).start()
+    _czekaj(lambda: serwer.started)
+    return f"http://127.0.0.1:{gniazdo.getsockname()[1]}", serwer
+
+
+def test_klienci_po_wyczerpaniu_prob():
+    """Oba klienty zwracają słownik z błędem, gdy serwer do końca odpowiada 503"""
+    proby = []
+    przeciazony = FastAPI()
+
+    @przeciazony.get("/{op}/{a}/{b}")
+    def zawsze_503(op: str, a: float, b: float):
+        proby.append(op)
+        if op == "dodaj":
+            return JSONResponse({"detail": "przeciążony"}, status_code=503)
+        return {"wynik": a * b}
+
+    adres, serwer = _serwer_w_tle(przeciazony)
+    try:
+        with klient_kalkulatora.KlientKalkulatora(adres, proby=2, opoznienie=0) as klient:
+            wynik = klient.oblicz("dodaj", 1, 2)
+            assert wynik["error"] == "Błąd 503" and "przeciążony" in wynik["details"]
+            assert klient.oblicz("pomnoz", 2, 3) == {"wynik": 6.0}
+        assert proby.count("dodaj") == 3
+
+        async def asynchronicznie():
+            async with klient_kalkulatora.AsyncKlientKalkulatora(adres, proby=2, opoznienie=0) as klient:
+                return await klient.oblicz("dodaj", 1, 2)
+
+        assert asyncio.run(asynchronicznie()) == wynik
+        assert proby.count("dodaj") == 6
+    finally:
+        serwer.should_exit = True
+
+
+if __name__ == "__main__":
+    test_batch_bledy_elementow()
+    test_wyrazenia_ze_spacjami()
+    test_wektor_przepelnienie()
+    test_historia_cykliczna()
+    test_odpowiedz_duze_liczby()
+    test_obliczenia_poza_petla_zdarzen()
+    test_tryby_dokladne()
+    test_sesja_ws_przezywa_bledy()
+    print("Testy kalkulatora REST: OK")
@@ -0,0 +1,187 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from graphql import parse
+
+import oceny_graphql
+from repozytorium_ocen import RepozytoriumOcen
+from zapytania_utrwalone import RejestrZapytan, skrot_zapytania
+
+ZAGNIEZDZONE = """
+{
+  studenci { imie oceny { ocena przedmiot { nazwa } } }
+  przedmioty { nazwa oceny { student { imie } } }
+  student(id: 2) { imie }
+}
+"""
+
+
+def _wykonaj(zapytanie, **argumenty):
+    return asyncio.run(oceny_graphql.schemat.execute(zapytanie, **argumenty))
+
+
+def test_loadery_bez_kontekstu(monkeypatch):
+    """Zagnieżdżone pola działają bez kontekstu, a w wykonaniu async idą paczkami"""
+    wywolania = []
+    oceny_studentow = oceny_graphql.Loadery._oceny_studentow
+
+    async def licz_wywolania(ids):
+        wywolania.append(list(ids))
+        return await oceny_studentow(ids)
+
+    monkeypatch.setattr(oceny_graphql.Loadery, "_oceny_studentow", staticmethod(licz_wywolania))
+
+    synchronicznie = oceny_graphql.schemat.execute_sync(ZAGNIEZDZONE)
+    assert synchronicznie.errors is None
+    assert wywolania == []
+
+    for argumenty in ({}, {"context_value": {}}, {"context_value": oceny_graphql.kontekst()}):
+        wynik = _wykonaj(ZAGNIEZDZONE, **argumenty)
+        assert wynik.errors is None
+        assert wynik.data == synchronicznie.data
+    # jedno wywołanie funkcji wsadowej na zapytanie, ze wszystkimi studentami naraz
+    assert wywolania == [[1, 2, 3]] * 3
+    assert synchronicznie.data["studenci"][0]["oceny"][1]["przedmiot"]["nazwa"] == "Bazy danych"
+    assert synchronicznie.data["przedmioty"][0]["oceny"][1]["student"]["imie"] == "Katarzyna"
+
+
+
+def _repozytorium_testowe():
+    Student, Ocena = oceny_graphql.Student, oceny_graphql.Ocena
+    studenci = [Student(id=i, imie=f"S{i}", nazwisko="", kierunek="", rok_studiow=1) for i in (3, 1, 2)]
+    oceny = [Ocena(id=i, student_id=1, przedmiot_id=1, ocena=w, data="", komentarz="")
+             for i, w in ((2, 3.0), (1, 5.0), (3, 3.0))]
+    return RepozytoriumOcen(studenci, oceny_graphql.przedmioty, oceny)
+
+
+def test_statystyki_biezace(monkeypatch):
+    """Statystyki i indeksy zgadzają się po dodaniu i zmianie ocen"""
+    repozytorium = _repozytorium_testowe()
+    monkeypatch.setattr(oceny_graphql, "repozytorium", repozytorium)
+    assert [o.id for o in repozytorium.oceny_studenta(1)] == [1, 2, 3]
+    assert repozytorium.statystyki(2) is None
+
+    wynik = oceny_graphql.schemat.execute_sync(
+        'mutation { dodajOcene(studentId: 2, przedmiotId: 3, ocena: 4.0) { id } }')
+    assert wynik.data["dodajOcene"]["id"] == 4
+    assert oceny_graphql.schemat.execute_sync(
+        'mutation { dodajOcene(studentId: 9, przedmiotId: 1, ocena: 4.0) { id } }').errors
+
+    repozytorium.aktualizuj_ocene(1, 2.0)
+    agregat = repozytorium.statystyki(1)
+    assert (agregat.liczba, agregat.srednia, agregat.najmniejsza, agregat.najwieksza) == (3, 8.0 / 3, 2.0, 3.0)
+    repozytorium.aktualizuj_ocene(2, 4.5)
+    repozytorium.aktualizuj_ocene(3, 4.5)
+    assert (agregat.najmniejsza, agregat.najwieksza) == (2.0, 4.5)
+    assert repozytorium.aktualizuj_ocene(99, 3.0) is None
+
+    wynik = oceny_graphql.schemat.execute_sync(
+        "{ statystykiStudenta(studentId: 2) { sredniaOcen liczbaOcen najlepszaOcena student { imie } } }")
+    assert wynik.data["statystykiStudenta"] == {
+        "sredniaOcen": 4.0, "liczbaOcen": 1, "najlepszaOcena": 4.0, "student": {"imie": "S2"}}
+    assert oceny_graphql.schemat.execute_sync("{ statystykiStudenta(studentId: 3) { liczbaOcen } }").errors
+    assert [o.id for o in repozytorium.oceny_przedmiotu(3)] == [4]
+
+
+
+def _kod_bledu(odpowiedz: dict):
+    return odpowiedz["errors"][0]["extensions"]["code"] if "errors" in odpowiedz else None
+
+
+def test_zapytania_utrwalone():
+    """Nieznany skrót, rejestracja pełnym tekstem, potem sam skrót; zły skrót i wersja są odrzucane"""
+    zapytanie = "query Utrwalone { przedmioty { id nazwa } }"
+    utrwalone = {"persistedQuery": {"version": 1, "sha256Hash": skrot_zapytania(zapytanie)}}
+    # strawberry.asgi.GraphQL nie obsługuje lifespan, więc klient bez "with"
+    klient = TestClient(oceny_graphql.app)
+
+    def wyslij(**tresc):
+        return klient.post("/graphql", json=tresc).json()
+
+    assert _kod_bledu(wyslij(extensions=utrwalone)) == "PERSISTED_QUERY_NOT_FOUND"
+    pelne = wyslij(query=zapytanie, extensions=utrwalone)
+    assert _kod_bledu(pelne) is None
+    assert wyslij(extensions=utrwalone) == pelne
+
+    inny_skrot = {"persistedQuery": {"version": 1, "sha256Hash": "0" * 64}}
+    assert _kod_bledu(wyslij(query=zapytanie, extensions=inny_skrot)) == "BAD_USER_INPUT"
+    zla_wersja = {"persistedQuery": {"version": 2, "sha256Hash": skrot_zapytania(zapytanie)}}
+    assert _kod_bledu(wyslij(extensions=zla_wersja)) == "PERSISTED_QUERY_NOT_SUPPORTED"
+
+    rejestr = RejestrZapytan(maks_zapytan=2)
+    for numer in range(3):
+        rejestr.zarejestruj(f"skrot{numer}", f"zapytanie {numer}")
+    assert len(rejestr) == 2
+    assert rejestr.pobierz("skrot0") is None and rejestr.pobierz("skrot2") == "zapytanie 2"
+
+
+
+def test_limit_kosztu():
+    """Za drogie i za głębokie zapytania są odrzucane przed wykonaniem, także z ujemnym first obok"""
+    drogie = "deep: studenci { oceny { student { oceny { id } } } }"
+    wynik = _wykonaj("{ %s }" % drogie)
+    assert wynik.data is None
+    assert wynik.errors[0].extensions["code"] == "QUERY_TOO_COMPLEX"
+    assert wynik.errors[0].extensions["koszt"] == 100 * (1 + 20 * (1 + 1 + 20))
+
+    obejscie = "{ %s tani: studenciConnection(first: -100000000) { edges { node { id } } } }" % drogie
+    wynik = _wykonaj(obejscie)
+    assert wynik.errors[0].extensions["code"] == "QUERY_TOO_COMPLEX"
+    # pole z ujemnym first nie obniża kosztu reszty zapytania
+    assert wynik.errors[0].extensions["koszt"] == 100 * (1 + 20 * (1 + 1 + 20)) + 1
+
+    gleboko = "{ studenciConnection(first: 1) { edges { node { oceny { przedmiot { oceny { student { oceny { id } } } } } } } } }"
+    assert _wykonaj(gleboko).errors[0].extensions["code"] == "QUERY_TOO_DEEP"
+    assert _wykonaj("{ studenciConnection(first: 5) { edges { node { oceny { id } } } } }").errors is None
+
+    # first ponad MAKS_STRONA kosztuje tyle, co pełna strona, bo resolver i tak zwróci najwyżej tyle
+    duza_strona = "{ studenciConnection(first: %d) { edges { node { oceny { id } } } } }"
+    wynik = _wykonaj(duza_strona % 500)
+    assert wynik.errors is None and len(wynik.data["studenciConnection"]["edges"]) == 3
+    koszt = oceny_graphql.analizator_kosztu.policz
+    schemat_graphql = oceny_graphql.schemat._schema
+    assert koszt(schemat_graphql, None, parse(duza_strona % 500)) == koszt(schemat_graphql, None, parse(duza_strona % 100))
+
+
+
+def test_stronicowanie_kursorem(monkeypatch):
+    """Kolejne strony przechodzą wszystkich studentów bez powtórzeń, a złe argumenty są błędem"""
+    Student, Ocena = oceny_graphql.Student, oceny_graphql.Ocena
+    studenci = [Student(id=i, imie="", nazwisko="", kierunek="", rok_studiow=1) for i in range(1, 251)]
+    oceny = [Ocena(id=i, student_id=7, przedmiot_id=1, ocena=4.0, data="", komentarz="") for i in range(1, 6)]
+    monkeypatch.setattr(oceny_graphql, "repozytorium", RepozytoriumOcen(studenci, oceny_graphql.przedmioty, oceny))
+
+    zapytanie = """query Strona($po: String) {
+      studenciConnection(first: 120, after: $po) {
+        edges { cursor node { id } }
+        pageInfo { hasNextPage hasPreviousPage endCursor }
+      }
+    }"""
+    ids, po, strony = [], None, 0
+    while True:
+        wynik = oceny_graphql.schemat.execute_sync(zapytanie, variable_values={"po": po})
+        polaczenie = wynik.data["studenciConnection"]
+        assert len(polaczenie["edges"]) <= oceny_graphql.MAKS_STRONA
+        assert polaczenie["pageInfo"]["hasPreviousPage"] == (po is not None)
+        ids += [k["node"]["id"] for k in polaczenie["edges"]]
+        strony += 1
+        if not polaczenie["pageInfo"]["hasNextPage"]:
+            break
+        po = polaczenie["pageInfo"]["endCursor"]
+        assert po == polaczenie["edges"][-1]["cursor"]
+    assert ids == list(range(1, 251)) and strony == 3
+
+    oceny_strony = oceny_graphql.schemat.execute_sync(
+        '{ ocenyConnection(studentId: 7, first: 2, after: "%s") { edges { node { id } } pageInfo { hasNextPage } } }'
+        % oceny_graphql.kursor("ocena", 2)).data["ocenyConnection"]
+    assert [k["node"]["id"] for k in oceny_strony["edges"]] == [3, 4] and oceny_strony["pageInfo"]["hasNextPage"]
+
+    for argumenty in ('first: -1', 'after: "nie-kursor"', 'after: "%s"' % oceny_graphql.kursor("ocena", 1)):
+        wynik = oceny_graphql.schemat.execute_sync("{ studenciConnection(%s) { edges { cursor } } }" % argumenty)
+        assert wynik.errors and wynik.data is None, argumenty
+
+
+if __name__ == "__main__":
+    import pytest
+
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,375 @@
+import asyncio
+import json
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+import todo_api
+from pamiec_wynikow import PamiecWynikow
+from repozytorium_sqlite import RepozytoriumSQLite
+from repozytorium_zadan import RepozytoriumZadan, Zadanie
+from wyszukiwanie import MAKS_ROZWINIEC, IndeksWyszukiwania, tokeny
+from zmiany_zadan import KanalZmian
+
+LICZBA_ZMIAN = 10_000
+WATKI = 32
+
+
+def _rownolegle(funkcja, argumenty):
+    with ThreadPoolExecutor(max_workers=WATKI) as wykonawca:
+        return list(wykonawca.map(funkcja, argumenty))
+
+
+@pytest.fixture(params=["pamiec", "sqlite"])
+def repozytorium(request, tmp_path, monkeypatch):
+    """Świeże repozytorium podpięte pod todo_api tak jak przy starcie: indeks, zmiany i pamięć odpowiedzi"""
+    if request.param == "sqlite":
+        nowe = RepozytoriumSQLite(str(tmp_path / "zadania.db"))
+    else:
+        nowe = RepozytoriumZadan()
+    zmiany = KanalZmian()
+    monkeypatch.setattr(todo_api, "repozytorium", nowe)
+    monkeypatch.setattr(todo_api, "indeks", IndeksWyszukiwania())
+    monkeypatch.setattr(todo_api, "zmiany", zmiany)
+    monkeypatch.setattr(todo_api, "odpowiedzi", PamiecWynikow(maks_wpisow=1024, maks_bajtow=64 * 1024 * 1024))
+    monkeypatch.setattr(todo_api, "POCHODZENIE_WERSJI", f"{request.param}-")
+    nowe.obserwuj(todo_api._aktualizuj_indeks)
+    nowe.obserwuj(zmiany.opublikuj)
+    return nowe
+
+
+def test_rownolegle_zmiany(repozytorium):
+    """10 tys. równoległych zmian: unikalne id, żadna zmiana nie ginie, indeksy się zgadzają"""
+    liczba_na_start = len(repozytorium)
+    wersja_na_start = repozytorium.wersja()
+    dodawane = LICZBA_ZMIAN // 2
+
+    with TestClient(todo_api.app) as klient:
+        def dodaj(numer):
+            odpowiedz = klient.post("/zadania/dodaj", params={"tytul": f"Stres {numer}", "opis": f"opis{numer}"})
+            return odpowiedz.json()["nowe_zadanie"]
+
+        nowe = _rownolegle(dodaj, range(dodawane))
+        ids = [z["id"] for z in nowe]
+        assert len(set(ids)) == dodawane, "powtórzone id"
+        assert len(repozytorium) == liczba_na_start + dodawane
+        for zadanie in nowe:
+            numer = int(zadanie["tytul"].split()[1])
+            assert zadanie["opis"] == f"opis{numer}", "id przypisane do cudzego zadania"
+
+        # druga połowa: oznaczanie i usuwanie tych samych zadań naraz, w losowej kolejności
+        random.seed(19)
+        do_usuniecia = set(random.sample(ids, dodawane // 2))
+        zmiany = [("usun", i) for i in do_usuniecia] + [("zrobione", i) for i in ids if i not in do_usuniecia]
+        random.shuffle(zmiany)
+
+        def zmien(zmiana):
+            rodzaj, id_zadania = zmiana
+            if rodzaj == "usun":
+                odpowiedz = klient.delete(f"/zadania/{id_zadania}/usun")
+                return odpowiedz.json()["usuniete"]["id"] == id_zadania
+            odpowiedz = klient.put(f"/zadania/{id_zadania}/zrobione")
+            return odpowiedz.json()["nowe_zadanie"]["id"] == id_zadania
+
+        assert all(_rownolegle(zmien, zmiany))
+
+        assert len(repozytorium) == liczba_na_start + dodawane - len(do_usuniecia)
+        assert repozytorium.wersja() - wersja_na_start == LICZBA_ZMIAN, "zgubione zmiany"
+        zrobione = {z.id for z in repozytorium.filtruj(True)}
+        niezrobione = {z.id for z in repozytorium.filtruj(False)}
+        for id_zadania in ids:
+            if id_zadania in do_usuniecia:
+                assert repozytorium.pobierz(id_zadania) is None
+                assert id_zadania not in zrobione and id_zadania not in niezrobione
+            else:
+                assert repozytorium.pobierz(id_zadania).zrobione
+                assert id_zadania in zrobione and id_zadania not in niezrobione
+
+        strony = [z["id"] for z in klient.get("/zadania/").json()["zadania"]]
+        assert strony == sorted(strony) and len(strony) == len(repozytorium)
+        znalezione = {z["id"] for z in klient.get("/zadania/szukaj", params={"q": "stres", "limit": dodawane}).json()["zadania"]}
+        assert znalezione == set(ids) - do_usuniecia
+
+
+def test_zmiany_wielu_zadan(repozytorium):
+    """PATCH i DELETE /zadania: wynik dla każdego id, także nieistniejącego i powtórzonego"""
+    with TestClient(todo_api.app) as klient:
+        ids = [klient.post("/zadania/dodaj", params={"tytul": f"Sprint {i}", "opis": ""}).json()["nowe_zadanie"]["id"]
+               for i in range(4)]
+        brak = max(ids) + 1000
+
+        odpowiedz = klient.patch("/zadania", json={"ids": [ids[0], ids[1], ids[0], brak]}).json()
+        assert odpowiedz["zmienione"] == 2
+        assert odpowiedz["wyniki"] == [
+            {"id": ids[0], "wynik": "zrobione"},
+            {"id": ids[1], "wynik": "zrobione"},
+            {"id": brak, "wynik": "nie znaleziono"},
+        ]
+        assert klient.patch("/zadania", json={"ids": [ids[1]]}).json()["wyniki"][0]["wynik"] == "już zrobione"
+
+        odpowiedz = klient.request("DELETE", "/zadania", json={"status": "zrobione"}).json()
+        assert {ids[0], ids[1]} <= {w["id"] for w in odpowiedz["wyniki"]}
+        assert all(w["wynik"] == "usuniete" for w in odpowiedz["wyniki"])
+        assert not repozytorium.filtruj(True)
+        assert repozytorium.pobierz(ids[2]) is not None
+
+        odpowiedz = klient.request("DELETE", "/zadania", json={"ids": [ids[2], ids[0]]}).json()
+        assert [w["wynik"] for w in odpowiedz["wyniki"]] == ["usuniete", "nie znaleziono"]
+        assert "error" in klient.patch("/zadania", json={}).json()
+        assert "error" in klient.patch("/zadania", json={"status": "inne"}).json()
+
+
+def test_filtruj_rosnaco_po_id(tmp_path):
+    """Filtrowanie zwraca zadania rosnąco po id, choć oznaczane są w innej kolejności"""
+    for repozytorium in (RepozytoriumZadan(), RepozytoriumSQLite(str(tmp_path / "zadania.db"))):
+        repozytorium.dodaj_wiele((f"Zadanie {i}", "", False) for i in range(10))
+        for id_zadania in (7, 2, 9, 4):
+            repozytorium.oznacz_zrobione(id_zadania)
+        repozytorium.usun(9)
+        repozytorium.usun(3)
+        assert [z.id for z in repozytorium.filtruj(True)] == [2, 4, 7]
+        assert [z.id for z in repozytorium.filtruj(False)] == [1, 5, 6, 8, 10]
+
+
+def test_stronicowanie_kursorem(repozytorium):
+    """Strony po id, wybrane pola i eksport NDJSON przechodzą wszystkie zadania także po usunięciach"""
+    with TestClient(todo_api.app) as klient:
+        ids = [klient.post("/zadania/dodaj", params={"tytul": f"Strona {i}", "opis": "x"}).json()["nowe_zadanie"]["id"]
+               for i in range(200)]
+        klient.delete(f"/zadania/{ids[5]}/usun")
+        klient.request("DELETE", "/zadania", json={"ids": ids[100:180]})
+        oczekiwane = [z.id for z in repozytorium.wszystkie()]
+
+        zebrane, po_id = [], 0
+        while po_id is not None:
+            odpowiedz = klient.get("/zadania/", params={"after": po_id, "limit": 7, "fields": "id,tytul"}).json()
+            assert all(set(z) == {"id", "tytul"} for z in odpowiedz["zadania"])
+            zebrane += [z["id"] for z in odpowiedz["zadania"]]
+            po_id = odpowiedz["nastepny"]
+        assert zebrane == oczekiwane
+        assert klient.get("/zadania/", params={"after": ids[-1], "limit": 7}).json() == {"zadania": [], "nastepny": None}
+        assert "error" in klient.get("/zadania/", params={"fields": "id,haslo"}).json()
+
+        linie = klient.get("/zadania/ndjson", params={"after": ids[0]}).text.splitlines()
+        assert [json.loads(l) for l in linie] == [z.jako_slownik() for z in repozytorium.strona(ids[0], len(oczekiwane))]
+        linie = klient.get("/zadania/ndjson", params={"fields": "id"}).text.splitlines()
+        assert [json.loads(l) for l in linie] == [{"id": i} for i in oczekiwane]
+
+    if isinstance(repozytorium, RepozytoriumZadan):
+        # usunięte id nie zostają na liście do stronicowania
+        assert repozytorium._kolejnosc == oczekiwane
+
+
+def test_zadanie_jako_json():
+    """Ręcznie składany JSON zadania czyta się tak samo jak jego słownik"""
+    tytuly = ['cudzysłów " w środku', "ukośnik \\ i \\n", "zażółć gęślą jaźń ✓ 日本", "sterujące \t\n\r\x00\x1f\x7f",
+              "\u2028\u2029 i emoji 🎉", ""]
+    for numer, tytul in enumerate(tytuly, start=1):
+        for zadanie in (Zadanie(numer, tytul, tytul[::-1], False), Zadanie(2 ** 40, tytul, "", True)):
+            assert json.loads(zadanie.jako_json()) == zadanie.jako_slownik()
+
+
+def _krotki(zadania) -> list:
+    return [(z.tytul, z.opis, z.zrobione) for z in zadania]
+
+
+def test_import_ndjson_i_csv(repozytorium, monkeypatch):
+    """Import NDJSON i CSV: złe wiersze są liczone z numerem linii, a reszta trafia do repozytorium"""
+    monkeypatch.setattr(todo_api, "ROZMIAR_PARTII", 2)
+    with TestClient(todo_api.app) as klient:
+        ndjson = "\n".join([
+            '{"tytul": "Pierwsze", "opis": "a"}',
+            '{"tytul": "urwane"',
+            '[1, 2]',
+            '{"opis": "bez tytułu"}',
+            '',
+            '{"tytul": "Drugie", "zrobione": true}',
+            '{"tytul": "Trzecie", "opis": null, "zrobione": "tak"}',
+        ])
+        wynik = klient.post("/zadania/bulk", content=ndjson, headers={"content-type": "application/x-ndjson"}).json()
+        assert (wynik["sukces"], wynik["dodane"], wynik["błędne wiersze"]) == (False, 3, 3)
+        assert [b["wiersz"] for b in wynik["błędy"]] == [2, 3, 4]
+        assert wynik["błędy"][0]["error"] == "Niepoprawny JSON"
+        assert _krotki(repozytorium.wszystkie()) == [("Pierwsze", "a", False), ("Drugie", "", True),
+                                                     ("Trzecie", "", True)]
+
+        csv_tekst = 'tytul,opis,zrobione\n"Kupić ""mleko""",zwykły,0\nB,"dwie\nlinie",tak\n,bez tytułu,0\nC,,1\n'
+        wynik = klient.post("/zadania/bulk", content=csv_tekst.encode("utf-8"), headers={"content-type": "text/csv"}).json()
+        assert (wynik["dodane"], wynik["błędne wiersze"]) == (3, 1)
+        assert wynik["błędy"] == [{"wiersz": 5, "error": "Brak pola tytul"}]
+        assert _krotki(repozytorium.wszystkie())[3:] == [('Kupić "mleko"', "zwykły", False), ("B", "dwie\nlinie", True),
+                                                         ("C", "", True)]
+
+        urwany = 'tytul,opis\nD,"bez końca\n'
+        wynik = klient.post("/zadania/bulk", content=urwany, headers={"content-type": "text/csv"}).json()
+        assert wynik["błędy"] == [{"wiersz": 2, "error": "Niezamknięty cudzysłów na końcu pliku"}]
+        bez_naglowka = klient.post("/zadania/bulk", content="a,b\n", headers={"content-type": "text/csv"}).json()
+        assert bez_naglowka["dodane"] == 0 and bez_naglowka["błędne wiersze"] == 1
+        assert len(repozytorium) == 6
+
+
+def test_eksport_i_ponowny_import(repozytorium):
+    """Eksport NDJSON i CSV zawiera wszystkie zadania, a wczytany z powrotem daje te same zadania"""
+    repozytorium.dodaj_wiele([("Zwykłe", "opis", False), ('Z "cudzysłowem", przecinkiem', "dwie\nlinie", True),
+                              ("Zażółć ✓", "", False)])
+    repozytorium.usun(1)
+    oczekiwane = _krotki(repozytorium.wszystkie())
+    with TestClient(todo_api.app) as klient:
+        ndjson = klient.get("/zadania/export").text
+        assert [json.loads(l) for l in ndjson.splitlines()] == [z.jako_slownik() for z in repozytorium.wszystkie()]
+        csv_tekst = klient.get("/zadania/export", params={"format": "csv"}).text
+        assert csv_tekst.splitlines()[0] == "id,tytul,opis,zrobione"
+        assert "error" in klient.get("/zadania/export", params={"format": "xml"}).json()
+
+        for tresc, typ in ((ndjson, "application/x-ndjson"), (csv_tekst, "text/csv")):
+            wynik = klient.post("/zadania/bulk", content=tresc.encode("utf-8"), headers={"content-type": typ}).json()
+            assert wynik["sukces"] and wynik["dodane"] == len(oczekiwane)
+            assert _krotki(repozytorium.wszystkie())[-len(oczekiwane):] == oczekiwane
+
+
+def test_wyszukiwanie(repozytorium):
+    """Przecięcie wielu słów daje te same wyniki co pełne przejście, a zbyt krótki prefiks jest zgłaszany"""
+    losowe = random.Random(16)
+    slowa = ["kot", "kotlet", "pies", "zakupy", "zażółć", "mleko", "chleb", "dom"]
+    zadania = [Zadanie(i, " ".join(losowe.sample(slowa, 2)), " ".join(losowe.choices(slowa, k=3)))
+               for i in range(1, 301)]
+    indeks = IndeksWyszukiwania()
+    for zadanie in zadania:
+        indeks.dodaj(zadanie)
+
+    for zapytanie in ("kot", "kot mleko", "zazolc dom chleb", "pies pies", "ko zakupy", "brak"):
+        pasujace = [z.id for z in zadania if all(
+            any(t.startswith(s) for t in tokeny(z.tytul + " " + z.opis)) for s in tokeny(zapytanie))]
+        wyniki, obciete = indeks.szukaj(zapytanie, limit=len(zadania))
+        assert sorted(i for i, _ in wyniki) == pasujace and not obciete, zapytanie
+        oceny = [ocena for _, ocena in wyniki]
+        assert oceny == sorted(oceny, reverse=True)
+        assert indeks.szukaj(zapytanie, limit=3)[0] == wyniki[:3]
+
+    for numer in range(MAKS_ROZWINIEC + 10):
+        indeks.dodaj(Zadanie(1000 + numer, f"slowo{numer:03d}", ""))
+    wyniki, obciete = indeks.szukaj("slowo", limit=1000)
+    assert obciete and len(wyniki) == MAKS_ROZWINIEC
+    assert indeks.szukaj("slowo05", limit=1000)[1] is False
+
+    with TestClient(todo_api.app) as klient:
+        for numer in range(MAKS_ROZWINIEC + 1):
+            klient.post("/zadania/dodaj", params={"tytul": f"prefiks{numer}", "opis": ""})
+        assert klient.get("/zadania/szukaj", params={"q": "prefiks"}).json()["obciete"] is True
+        odpowiedz = klient.get("/zadania/szukaj", params={"q": "prefiks1"}).json()
+        assert odpowiedz["obciete"] is False and len(odpowiedz["zadania"]) == 11
+
+
+def test_etag_i_pamiec_odpowiedzi(repozytorium, monkeypatch):
+    """Aktualny ETag daje 304 bez treści, każda zmiana daje nowy ETag, a pamięć bajtów ma limit"""
+    with TestClient(todo_api.app) as klient:
+        id_zadania = klient.post("/zadania/dodaj", params={"tytul": "ETag", "opis": ""}).json()["nowe_zadanie"]["id"]
+        odpowiedz = klient.get("/zadania/")
+        etag = odpowiedz.headers["etag"]
+        for naglowek in (etag, f"W/{etag}", f'"inny", {etag}', "*"):
+            ponownie = klient.get("/zadania/", headers={"If-None-Match": naglowek})
+            assert ponownie.status_code == 304 and ponownie.content == b"", naglowek
+            assert ponownie.headers["etag"] == etag
+        assert klient.get("/zadania/", headers={"If-None-Match": '"inny"'}).content == odpowiedz.content
+
+        etagi = [etag]
+        for zmiana in (lambda: klient.post("/zadania/dodaj", params={"tytul": "Nowe", "opis": ""}),
+                       lambda: klient.put(f"/zadania/{id_zadania}/zrobione"),
+                       lambda: klient.delete(f"/zadania/{id_zadania}/usun")):
+            zmiana()
+            odpowiedz = klient.get("/zadania/", headers={"If-None-Match": etagi[-1]})
+            assert odpowiedz.status_code == 200
+            etagi.append(odpowiedz.headers["etag"])
+        assert len(set(etagi)) == len(etagi)
+        # nieudana zmiana nie zmienia wersji
+        klient.delete(f"/zadania/{id_zadania}/usun")
+        assert klient.get("/zadania/", headers={"If-None-Match": etagi[-1]}).status_code == 304
+
+        odpowiedzi = PamiecWynikow(maks_wpisow=1000, maks_bajtow=4096)
+        monkeypatch.setattr(todo_api, "odpowiedzi", odpowiedzi)
+        klient.post("/zadania/bulk", content="\n".join(f'{{"tytul": "Zadanie {i}", "opis": "{"x" * 50}"}}'
+                                                         for i in range(100)))
+        for po_id in range(100):
+            assert klient.get("/zadania/", params={"after": po_id, "limit": 5}).status_code == 200
+            assert odpowiedzi._bajty <= odpowiedzi.maks_bajtow
+        assert 0 < len(odpowiedzi._wpisy) < 100
+        assert odpowiedzi.metryki()["chybienia"] == 100
+
+
+def _numer_zdarzenia(tekst: str) -> int:
+    return int(tekst.split("\n")[0].removeprefix("id: "))
+
+
+def test_kanal_zmian():
+    """Wznowienie po Last-Event-ID, przepełniona kolejka i rozłączeni subskrybenci"""
+    async def scenariusz():
+        kanal = KanalZmian(rozmiar_bufora=4, rozmiar_kolejki=2)
+        zadanie = Zadanie(1, "SSE", "")
+        for _ in range(5):
+            kanal.opublikuj("dodane", zadanie)
+
+        # wznowienie: tylko zdarzenia po Last-Event-ID, potem nowe z innego wątku
+        strumien = kanal.strumien(3)
+        assert [_numer_zdarzenia(await anext(strumien)) for _ in range(2)] == [4, 5]
+        nastepne = asyncio.ensure_future(anext(strumien))
+        await asyncio.sleep(0)
+        watek = threading.Thread(target=kanal.opublikuj, args=("zrobione", zadanie))
+        watek.start()
+        watek.join()
+        tekst = await asyncio.wait_for(nastepne, 1)
+        assert _numer_zdarzenia(tekst) == 6 and "event: zrobione" in tekst
+        assert len(kanal) == 1
+        await strumien.aclose()
+        assert len(kanal) == 0, "rozłączony subskrybent zostaje na liście"
+
+        # id spoza bufora albo z poprzedniego uruchomienia: reset zamiast dziury w zdarzeniach
+        for ostatnie_id in (99, 1):
+            strumien = kanal.strumien(ostatnie_id)
+            assert "event: reset" in await anext(strumien)
+            await strumien.aclose()
+
+        # kolejka nie nadąża: subskrybent jest rozłączany i wznawia z bufora
+        strumien = kanal.strumien(6)
+        czekajacy = asyncio.ensure_future(anext(strumien))
+        await asyncio.sleep(0)
+        for _ in range(4):
+            kanal.opublikuj("dodane", zadanie)
+        await asyncio.sleep(0.01)
+        try:
+            await asyncio.wait_for(czekajacy, 1)
+            raise AssertionError("przepełniony strumień powinien się zakończyć")
+        except StopAsyncIteration:
+            pass
+        assert len(kanal) == 0
+        strumien = kanal.strumien(6)
+        assert [_numer_zdarzenia(await anext(strumien)) for _ in range(4)] == [7, 8, 9, 10]
+        await strumien.aclose()
+
+    asyncio.run(scenariusz())
+
+
+def test_dane_startowe_raz(tmp_path):
+    """Workery startujące naraz na jednej bazie wstawiają dane startowe tylko raz"""
+    sciezka = str(tmp_path / "zadania.db")
+    dane = [("A", "", False), ("B", "", False), ("C", "", True)]
+    start = threading.Barrier(WATKI)
+
+    def uruchom_worker(_):
+        repozytorium = RepozytoriumSQLite(sciezka)
+        start.wait()
+        return repozytorium.dodaj_wiele(dane, tylko_do_pustego=True)
+
+    assert sorted(_rownolegle(uruchom_worker, range(WATKI))) == [0] * (WATKI - 1) + [3]
+    assert [z.tytul for z in RepozytoriumSQLite(sciezka).wszystkie()] == ["A", "B", "C"]
+
+    w_pamieci = RepozytoriumZadan()
+    assert w_pamieci.dodaj_wiele(dane, tylko_do_pustego=True) == 3
+    assert w_pamieci.dodaj_wiele(dane, tylko_do_pustego=True) == 0
+    assert len(w_pamieci) == 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -1,77 +1,294 @@
-from fastapi import FastAPI
-from starlette.responses import HTMLResponse
+import json
+import os
+import time
+from typing import List, Optional
+
+from fastapi import Body, FastAPI, Request
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+
+import przesyl_zadan
+
+from pamiec_wynikow import PamiecWynikow
+from repozytorium_sqlite import RepozytoriumSQLite
+from repozytorium_zadan import USUNIETE, ZROBIONE, RepozytoriumZadan, Zadanie
+from wyszukiwanie import IndeksWyszukiwania
+from zmiany_zadan import KanalZmian
 
 app = FastAPI()
 
-todo_list = []
+# TODO_BAZA=zadania.db przechowuje zadania w SQLite zamiast w pamięci procesu
+if os.environ.get("TODO_BAZA"):
+    repozytorium = RepozytoriumSQLite(os.environ["TODO_BAZA"])
+else:
+    repozytorium = RepozytoriumZadan()
+
+# kilka workerów może startować naraz na tej samej bazie: sprawdzenie i wstawienie idą razem
+repozytorium.dodaj_wiele([
+    ("Zrobić zakupy", "Mleko, chleb jajka", False),
+    ("Nauczyć się Pythona", "Przeczytać dokumentację FastAPI", False),
+    ("Posprzątać pokój", "Odkurzyć i umyć podłogę", False),
+], tylko_do_pustego=True)
+
+indeks = IndeksWyszukiwania()
+for zadanie in repozytorium.iteruj():
+    indeks.dodaj(zadanie)
+
+def _aktualizuj_indeks(rodzaj: str, zadanie: Zadanie):
+    if rodzaj == "dodane":
+        indeks.dodaj(zadanie)
+    elif rodzaj == "usuniete":
+        indeks.usun(zadanie.id)
+
+repozytorium.obserwuj(_aktualizuj_indeks)
+
+zmiany = KanalZmian()
+repozytorium.obserwuj(zmiany.opublikuj)
+
+# gotowe bajty odpowiedzi GET dla (ścieżka, parametry, wersja repozytorium);
+# po zmianie wersji stare wpisy po prostu wypadają z LRU
+odpowiedzi = PamiecWynikow(maks_wpisow=1024, maks_bajtow=64 * 1024 * 1024)
+# wersja z pamięci procesu liczy od zera po restarcie, więc ETag zawiera też chwilę startu;
+# wersja z SQLite jest wspólna dla workerów i przetrwa restart
+POCHODZENIE_WERSJI = "" if isinstance(repozytorium, RepozytoriumSQLite) else f"{time.time_ns():x}-"
+
+def _pasuje_etag(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    kandydaci = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in kandydaci or etag in kandydaci
 
-class Zadanie:
-    def __init__(self, id: int, tytul: str, opis: str, zrobione: bool = False):
-        self.id = id
-        self.tytul = tytul
-        self.opis = opis
-        self.zrobione = zrobione
+def _odpowiedz_z_pamieci(request: Request, tworz) -> Response:
+    """Odpowiedź JSON z ETagiem: 304 gdy klient ma aktualną wersję, w przeciwnym razie bajty z pamięci.
 
-todo_list.append(Zadanie(1, "Zrobić zakupy", "Mleko, chleb jajka"))
-todo_list.append(Zadanie(2, "Nauczyć się Pythona", "Przeczytać dokumentację FastAPI"))
-todo_list.append(Zadanie(3, "Posprzątać pokój", "Odkurzyć i umyć podłogę"))
+    Wersję czytamy przed zbudowaniem treści, więc treść jest co najwyżej
+    nowsza niż jej ETag - klient w najgorszym razie pobierze ją jeszcze raz.
+    """
+    wersja = repozytorium.wersja()
+    etag = f'"{POCHODZENIE_WERSJI}{wersja}"'
+    if _pasuje_etag(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    klucz = (request.url.path, request.url.query, wersja)
+    tresc = odpowiedzi.pobierz_lub_oblicz(klucz, lambda: JSONResponse(tworz()).body)
+    return Response(tresc, media_type="application/json", headers={"ETag": etag})
 
 @app.get("/")
 def witaj():
     return{"wiadomość": "Witaj w API Listy Zadań!", "autor": "Twoje API"}
 
+POLA_ZADANIA = ("id", "tytul", "opis", "zrobione")
+
+def _wybrane_pola(fields: Optional[str]):
+    """Zamień parametr ?fields=id,tytul na krotkę pól (None = wszystkie)"""
+    if fields is None:
+        return None
+    pola = tuple(p.strip() for p in fields.split(",") if p.strip())
+    nieznane = [p for p in pola if p not in POLA_ZADANIA]
+    if nieznane:
+        raise ValueError(f"Nieznane pola: {', '.join(nieznane)}")
+    return pola
+
+def _jako_slownik(zadanie, pola=None) -> dict:
+    if pola is None:
+        return zadanie.jako_slownik()
+    return {p: getattr(zadanie, p) for p in pola}
+
 @app.get("/zadania/")
-def pobierz_wszystkie_zadania():
-    return{"zadania": [vars(z) for z in todo_list]}
+def pobierz_wszystkie_zadania(request: Request, after: int = 0, limit: Optional[int] = None,
+                              fields: Optional[str] = None):
+    """Wszystkie zadania albo jedna strona: ?after=<ostatnie id>&limit=<ile>&fields=id,tytul"""
+    try:
+        pola = _wybrane_pola(fields)
+    except ValueError as e:
+        return {"error": str(e)}
 
-@app.get("/zadania/{id_zadania}")
-def pobierz_zadanie(id_zadania: int):
-    for zadanie in todo_list:
-        if zadanie.id == id_zadania:
-            return vars(zadanie)
-    return {"error": "Zadnie nie znalezione"}
+    def tworz():
+        if limit is None:
+            zadania = repozytorium.strona(after, len(repozytorium))
+            return{"zadania": [_jako_slownik(z, pola) for z in zadania]}
 
-@app.post("/zadania/dodaj")
-def dodaj_zadanie(tytul: str, opis: str):
-    max_id = max([z.id for z in todo_list]) if todo_list else 0
+        zadania = repozytorium.strona(after, max(limit, 0))
+        nastepny = zadania[-1].id if len(zadania) == limit and limit > 0 else None
+        return {"zadania": [_jako_slownik(z, pola) for z in zadania], "nastepny": nastepny}
 
-    nowe_zadanie = Zadanie(
-        id = max_id +1,
-        tytul = tytul,
-        opis = opis,
-        zrobione = False
+    return _odpowiedz_z_pamieci(request, tworz)
+
+@app.get("/zadania/ndjson")
+def pobierz_zadania_ndjson(after: int = 0, fields: Optional[str] = None):
+    """Wszystkie zadania jako NDJSON, serializowane po jednym (stała ilość pamięci)"""
+    try:
+        pola = _wybrane_pola(fields)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    def linie():
+        for zadanie in repozytorium.iteruj(after):
+            if pola is None:
+                yield zadanie.jako_json() + "\n"
+            else:
+                yield json.dumps(_jako_slownik(zadanie, pola), ensure_ascii=False) + "\n"
+
+    return StreamingResponse(linie(), media_type="application/x-ndjson")
+
+@app.get("/zadania/zmiany")
+async def strumien_zmian(request: Request, last_event_id: Optional[int] = None):
+    """Zmiany zadań na żywo (Server-Sent Events): zdarzenia dodane, zrobione, usuniete i reset"""
+    naglowek = request.headers.get("last-event-id")
+    if naglowek is not None and naglowek.isdigit():
+        last_event_id = int(naglowek)
+    return StreamingResponse(
+        zmiany.strumien(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    todo_list.append(nowe_zadanie)
+@app.get("/zadania/szukaj")
+def szukaj_zadan(q: str, limit: int = 20):
+    """Wyszukiwanie pełnotekstowe w tytułach i opisach (prefiksy, bez polskich znaków)"""
+    zadania = []
+    trafienia, obciete = indeks.szukaj(q, limit)
+    for id_zadania, trafnosc in trafienia:
+        zadanie = repozytorium.pobierz(id_zadania)
+        if zadanie is not None:
+            zadania.append({**zadanie.jako_slownik(), "trafność": round(trafnosc, 3)})
+    # obciete: krótki prefiks pasował do zbyt wielu słów, warto doprecyzować zapytanie
+    return {"zadania": zadania, "obciete": obciete}
+
+@app.get("/zadania/export")
+def eksport_zadan(format: str = "ndjson"):
+    """Wszystkie zadania jako strumień NDJSON albo CSV (?format=csv)"""
+    if format == "csv":
+        return StreamingResponse(przesyl_zadan.wiersze_csv(repozytorium.iteruj()), media_type="text/csv")
+    if format == "ndjson":
+        return StreamingResponse(przesyl_zadan.wiersze_ndjson(repozytorium.iteruj()),
+                                 media_type="application/x-ndjson")
+    return {"error": "Nieprawidłowy format"}
+
+ROZMIAR_PARTII = 5000
+
+@app.post("/zadania/bulk")
+async def import_zadan(request: Request):
+    """Import zadań z NDJSON albo CSV (Content-Type: text/csv), czytany strumieniowo i wstawiany partiami"""
+    start = time.perf_counter()
+    czytnik_csv = przesyl_zadan.CzytnikCSV() if "csv" in request.headers.get("content-type", "") else None
+    partia = []
+    dodane = 0
+    bledy = []
+    liczba_bledow = 0
+    numer = 0
+
+    try:
+        async for linia in przesyl_zadan.linie(request.stream()):
+            numer += 1
+            try:
+                if czytnik_csv is not None:
+                    zadanie = czytnik_csv.dodaj_linie(linia)
+                else:
+                    zadanie = przesyl_zadan.z_ndjson(linia)
+            except przesyl_zadan.BladWiersza as e:
+                liczba_bledow += 1
+                if len(bledy) < 10:
+                    bledy.append({"wiersz": numer, "error": str(e)})
+                continue
+            if zadanie is not None:
+                partia.append(zadanie)
+            if len(partia) >= ROZMIAR_PARTII:
+                dodane += await run_in_threadpool(repozytorium.dodaj_wiele, partia)
+                partia = []
+        if czytnik_csv is not None:
+            czytnik_csv.zakoncz()
+    except (przesyl_zadan.BladWiersza, UnicodeDecodeError) as e:
+        liczba_bledow += 1
+        bledy.append({"wiersz": numer, "error": str(e)})
+
+    if partia:
+        dodane += await run_in_threadpool(repozytorium.dodaj_wiele, partia)
+
+    czas = time.perf_counter() - start
+    return {
+        "sukces": liczba_bledow == 0,
+        "dodane": dodane,
+        "błędne wiersze": liczba_bledow,
+        "błędy": bledy,
+        "czas": round(czas, 3),
+        "wierszy na sekundę": round(dodane / czas) if czas > 0 else dodane,
+    }
+
+@app.get("/zadania/{id_zadania}")
+def pobierz_zadanie(request: Request, id_zadania: int):
+    def tworz():
+        zadanie = repozytorium.pobierz(id_zadania)
+        if zadanie is not None:
+            return zadanie.jako_slownik()
+        return {"error": "Zadnie nie znalezione"}
 
-    return {"sukces": True, "nowe_zadanie": vars(nowe_zadanie)}
+    return _odpowiedz_z_pamieci(request, tworz)
+
+@app.post("/zadania/dodaj")
+def dodaj_zadanie(tytul: str, opis: str):
+    nowe_zadanie = repozytorium.dodaj(tytul, opis)
+
+    return {"sukces": True, "nowe_zadanie": nowe_zadanie.jako_slownik()}
 
 @app.put("/zadania/{id_zadania}/zrobione")
 def oznacz_zrobione(id_zadania: int):
-    for zadanie in todo_list:
-        if zadanie.id == id_zadania:
-            zadanie.zrobione = True
-            return{"sukces": True, "nowe_zadanie": vars(zadanie)}
+    zadanie = repozytorium.oznacz_zrobione(id_zadania)
+    if zadanie is not None:
+        return{"sukces": True, "nowe_zadanie": zadanie.jako_slownik()}
     return {"error": "Zadanie nie znalezione"}
 
 @app.delete("/zadania/{id_zadania}/usun")
 def usun_zadanie(id_zadania: int):
-    for i, zadanie in enumerate(todo_list):
-        if zadanie.id == id_zadania:
-            usuniete = todo_list.pop(i)
-            return {"sukces": True, "usuniete": vars(usuniete)}
+    usuniete = repozytorium.usun(id_zadania)
+    if usuniete is not None:
+        return {"sukces": True, "usuniete": usuniete.jako_slownik()}
     return {"error": "Zadanie nie znalezione"}
 
+def _ids_do_zmiany(ids: Optional[List[int]], status: Optional[str]) -> list:
+    """Lista id z treści zapytania albo wszystkie id zadań o danym statusie"""
+    if (ids is None) == (status is None):
+        raise ValueError("Podaj ids albo status")
+    if ids is not None:
+        return ids
+    if status not in ("zrobione", "niezrobione"):
+        raise ValueError("Nieprawidłowy status")
+    return [z.id for z in repozytorium.filtruj(status == "zrobione")]
+
+def _wyniki_wielu(wyniki: list, udane: str) -> dict:
+    return {
+        "sukces": True,
+        "zmienione": sum(1 for _, wynik in wyniki if wynik == udane),
+        "wyniki": [{"id": id_zadania, "wynik": wynik} for id_zadania, wynik in wyniki],
+    }
+
+@app.patch("/zadania")
+def oznacz_wiele_zrobione(ids: Optional[List[int]] = Body(None), status: Optional[str] = Body(None)):
+    """Oznacz wiele zadań jako zrobione: {"ids": [1, 2]} albo {"status": "niezrobione"}"""
+    try:
+        do_zmiany = _ids_do_zmiany(ids, status)
+    except ValueError as e:
+        return {"error": str(e)}
+    return _wyniki_wielu(repozytorium.oznacz_wiele_zrobione(do_zmiany), ZROBIONE)
+
+@app.delete("/zadania")
+def usun_wiele_zadan(ids: Optional[List[int]] = Body(None), status: Optional[str] = Body(None)):
+    """Usuń wiele zadań: {"ids": [1, 2]} albo {"status": "zrobione"}"""
+    try:
+        do_usuniecia = _ids_do_zmiany(ids, status)
+    except ValueError as e:
+        return {"error": str(e)}
+    return _wyniki_wielu(repozytorium.usun_wiele(do_usuniecia), USUNIETE)
+
 @app.get("/zadania/filtruj/{status}")
-def filtruj_zadania(status: str):
+def filtruj_zadania(request: Request, status: str):
     if status == "zrobione":
-        zadania = [z for z in todo_list if z.zrobione]
+        zrobione = True
     elif status == "niezrobione":
-        zadania = [z for z in todo_list if not z.zrobione]
+        zrobione = False
     else:
         return {"error": "Nieprawidłowy status"}
 
-    return {"zadania": [vars(z) for z in zadania]}
+    return _odpowiedz_z_pamieci(request, lambda: {"zadania": [z.jako_slownik() for z in repozytorium.filtruj(zrobione)]})
 
 if __name__ == "__main__":
     import uvicorn
@@ -82,10 +299,18 @@ if __name__ == "__main__":
     print("\nDostępne endpointy:")
     print("1. GET /     - Strona główna")
     print("2. GET /zadania/    - Pobierz wszystkie zadania")
+    print("   GET /zadania/?after=0&limit=100&fields=id,tytul - Strona zadań")
+    print("   GET /zadania/ndjson - Wszystkie zadania jako strumień NDJSON")
     print("3. GET /zadania/{id} - Pobierz pojedyncze zadanie")
     print("4. POST /zadania/dodaj  - Dodaj nowe zadanie")
+    print("   POST /zadania/bulk  - Import wielu zadań (NDJSON albo CSV)")
+    print("   GET /zadania/export?format=csv  - Eksport wszystkich zadań")
     print("5. PUT /zadania/{id}/zrobione - Oznacz jako zrobione")
+    print("   PATCH /zadania - Oznacz wiele zadań jako zrobione (ids albo status)")
     print("6. DELETE /zadania/{id}/usun  - Usuń zadanie")
+    print("   DELETE /zadania - Usuń wiele zadań (ids albo status)")
     print("7. GET /zadania/filtruj/{status} - Filtruj zadania")
+    print("8. GET /zadania/szukaj?q=zakupy - Szukaj w tytułach i opisach")
+    print("9. GET /zadania/zmiany - Strumień zmian (Server-Sent Events)")
 
     uvicorn.run(app, host="127.0.0.1", port=8004)
\ No newline at end of file
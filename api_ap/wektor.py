@@ -0,0 +1,73 @@
+import numpy as np
+
+
+# każda operacja zwraca (wynik, maska błędów dziedziny); przepełnienia i NaN
+# dopisuje do maski oblicz_wektorowo
+def _dodaj(a, b):
+    return a + b, False
+
+def _odejmij(a, b):
+    return a - b, False
+
+def _pomnoz(a, b):
+    return a * b, False
+
+def _podziel(a, b):
+    return a / b, b == 0
+
+def _potega(a, b):
+    # ujemna podstawa z ułamkowym wykładnikiem daje NaN, które wyłapie maska
+    return np.power(a, b), False
+
+def _pierwiastek(a, b):
+    return np.sqrt(a), a < 0
+
+OPERACJE_WEKTOROWE = {
+    "dodaj": _dodaj,
+    "odejmij": _odejmij,
+    "pomnoz": _pomnoz,
+    "podziel": _podziel,
+    "potega": _potega,
+    "pierwiastek": _pierwiastek,
+}
+
+
+def _na_tablice(wartosc, nazwa: str) -> np.ndarray:
+    try:
+        tablica = np.asarray(wartosc, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ValueError(f"Pole {nazwa} musi być liczbą albo tablicą liczb")
+    if tablica.ndim > 1:
+        raise ValueError(f"Pole {nazwa} musi być jednowymiarową tablicą")
+    return tablica
+
+
+def oblicz_wektorowo(op: str, a, b=0.0):
+    """Wykonaj operację na całych tablicach.
+
+    Zwraca parę (wynik, maska_bledow). Elementy z błędem (dzielenie przez 0,
+    pierwiastek z liczby ujemnej, przepełnienie) mają w wyniku NaN, a w masce True.
+    """
+    if op not in OPERACJE_WEKTOROWE:
+        raise ValueError(f"Nieznana operacja: {op}")
+    a = _na_tablice(a, "a")
+    b = _na_tablice(b, "b")
+    if a.ndim == 1 and b.ndim == 1 and a.shape != b.shape:
+        raise ValueError(f"Tablice mają różne długości: {a.size} i {b.size}")
+
+    with np.errstate(all="ignore"):
+        wynik, maska = OPERACJE_WEKTOROWE[op](a, b)
+
+    maska = np.broadcast_to(maska, wynik.shape) | ~np.isfinite(wynik)
+    wynik = np.where(maska, np.nan, wynik)
+    return wynik, maska
+
+
+def na_liste(wynik: np.ndarray, maska: np.ndarray) -> list:
+    """Zamień wynik na listę Pythona, z None w miejscu błędów (NaN nie jest poprawnym JSON-em)"""
+    if wynik.ndim == 0:
+        return None if maska else float(wynik)
+    lista = wynik.tolist()
+    for indeks in np.flatnonzero(maska).tolist():
+        lista[indeks] = None
+    return lista
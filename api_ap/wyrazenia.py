@@ -0,0 +1,134 @@
+import ast
+import operator
+from functools import lru_cache
+
+from precyzja import DOMYSLNA_PRECYZJA, arytmetyka, liczba
+
+# limity chroniące serwer przed złośliwymi wyrażeniami
+MAKS_DLUGOSC = 1000
+MAKS_WEZLOW = 200
+MAKS_GLEBOKOSC = 100
+MAKS_WYKLADNIK = 1000
+MAKS_BITOW_WYNIKU = 10_000
+ROZMIAR_PAMIECI = 1024
+
+DOZWOLONE_ZNAKI = set("0123456789+-*/.() ")
+
+
+class BladWyrazenia(ValueError):
+    """Wyrażenie jest niepoprawne albo przekracza limity"""
+
+
+def _potega(a, b):
+    if abs(b) > MAKS_WYKLADNIK:
+        raise BladWyrazenia(f"Wykładnik większy niż {MAKS_WYKLADNIK}")
+    if isinstance(a, int) and isinstance(b, int) and abs(a).bit_length() * abs(b) > MAKS_BITOW_WYNIKU:
+        raise BladWyrazenia("Wynik potęgowania jest za duży")
+    return a ** b
+
+
+OPERATORY = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: _potega,
+}
+
+OPERATORY_UNARNE = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+def normalizuj(wyrazenie: str) -> str:
+    """Zwiń ciągi białych znaków w jedną spację, żeby "2  +  2" i "2 + 2" trafiały w ten sam wpis pamięci.
+
+    Spacji nie usuwamy całkiem, bo rozdzielają tokeny: "1 2" i "2 * * 3"
+    mają zostać błędami składni, a nie zamienić się w "12" i "2**3".
+    """
+    return " ".join(wyrazenie.split())
+
+
+# nazwy operacji w słownikach precyzja.arytmetyka() dla węzłów AST
+NAZWY_OPERATOROW = {
+    ast.Add: "dodaj",
+    ast.Sub: "odejmij",
+    ast.Mult: "pomnoz",
+    ast.Div: "podziel",
+    ast.Pow: "potega",
+}
+
+NAZWY_OPERATOROW_UNARNYCH = {
+    ast.UAdd: "plus",
+    ast.USub: "minus",
+}
+
+
+def _operacje(tryb: str, precyzja: int):
+    """Operatory dwuargumentowe, jednoargumentowe i konwersja stałych dla trybu"""
+    if tryb == "float":
+        return OPERATORY, OPERATORY_UNARNE, None
+    operacje = arytmetyka(tryb, precyzja)
+    binarne = {typ: operacje[nazwa] for typ, nazwa in NAZWY_OPERATOROW.items()}
+    unarne = {typ: operacje[nazwa] for typ, nazwa in NAZWY_OPERATOROW_UNARNYCH.items()}
+    stala = lambda tekst: liczba(tekst, tryb, precyzja)
+    return binarne, unarne, stala
+
+
+def _zbuduj(wezel, glebokosc: int, tekst: str, operacje):
+    """Zamień węzeł AST na funkcję bez argumentów zwracającą wynik"""
+    if glebokosc > MAKS_GLEBOKOSC:
+        raise BladWyrazenia(f"Wyrażenie zagnieżdżone głębiej niż {MAKS_GLEBOKOSC}")
+    binarne, unarne, stala = operacje
+
+    if isinstance(wezel, ast.Constant) and type(wezel.value) in (int, float):
+        # w trybach dokładnych stałą budujemy z tekstu, żeby 0.1 nie przeszło przez floata
+        wartosc = wezel.value if stala is None else stala(ast.get_source_segment(tekst, wezel))
+        return lambda: wartosc
+
+    if isinstance(wezel, ast.BinOp) and type(wezel.op) in binarne:
+        funkcja = binarne[type(wezel.op)]
+        lewy = _zbuduj(wezel.left, glebokosc + 1, tekst, operacje)
+        prawy = _zbuduj(wezel.right, glebokosc + 1, tekst, operacje)
+        return lambda: funkcja(lewy(), prawy())
+
+    if isinstance(wezel, ast.UnaryOp) and type(wezel.op) in unarne:
+        funkcja = unarne[type(wezel.op)]
+        argument = _zbuduj(wezel.operand, glebokosc + 1, tekst, operacje)
+        return lambda: funkcja(argument())
+
+    raise BladWyrazenia("Niedozwolona konstrukcja w wyrażeniu")
+
+
+@lru_cache(maxsize=ROZMIAR_PAMIECI)
+def _kompiluj(tekst: str, tryb: str = "float", precyzja: int = DOMYSLNA_PRECYZJA):
+    if len(tekst) > MAKS_DLUGOSC:
+        raise BladWyrazenia(f"Wyrażenie dłuższe niż {MAKS_DLUGOSC} znaków")
+    if not all(z in DOZWOLONE_ZNAKI for z in tekst):
+        raise BladWyrazenia("Niedozwolone znaki w wyrażeniu")
+
+    try:
+        drzewo = ast.parse(tekst, mode="eval")
+    except (SyntaxError, RecursionError, MemoryError):
+        raise BladWyrazenia("Niepoprawna składnia wyrażenia")
+
+    liczba_wezlow = sum(1 for w in ast.walk(drzewo.body) if isinstance(w, ast.expr))
+    if liczba_wezlow > MAKS_WEZLOW:
+        raise BladWyrazenia(f"Wyrażenie ma więcej niż {MAKS_WEZLOW} elementów")
+
+    return _zbuduj(drzewo.body, 0, tekst, _operacje(tryb, precyzja))
+
+
+def kompiluj(wyrazenie: str, tryb: str = "float", precyzja: int = DOMYSLNA_PRECYZJA):
+    """Skompiluj wyrażenie (albo pobierz je z pamięci podręcznej)"""
+    return _kompiluj(normalizuj(wyrazenie), tryb, precyzja)
+
+
+def policz(wyrazenie: str, tryb: str = "float", precyzja: int = DOMYSLNA_PRECYZJA):
+    """Oblicz wyrażenie zbudowane z liczb, + - * / ** i nawiasów.
+
+    Tryb "decimal" liczy na decimal.Decimal z podaną precyzją, a "ulamek"
+    na fractions.Fraction.
+    """
+    return kompiluj(wyrazenie, tryb, precyzja)()
@@ -0,0 +1,112 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+# litery, których NFKD nie rozkłada na literę bazową + znak diakrytyczny
+POLSKIE_ZNAKI = str.maketrans("łŁ", "lL")
+SLOWO = re.compile(r"\w+")
+WAGA_TYTULU = 3
+MAKS_ROZWINIEC = 64
+
+
+def tokeny(tekst: str) -> list:
+    """Małe litery bez polskich znaków: "Zażółć Gęślą" -> ["zazolc", "gesla"]"""
+    if tekst.isascii():
+        return SLOWO.findall(tekst.lower())
+    tekst = unicodedata.normalize("NFKD", tekst.translate(POLSKIE_ZNAKI).lower())
+    tekst = "".join(z for z in tekst if not unicodedata.combining(z))
+    return SLOWO.findall(tekst)
+
+
+class IndeksWyszukiwania:
+    """Indeks odwrócony tytułów i opisów zadań, aktualizowany przy każdej zmianie.
+
+    Dla każdego słowa trzyma słownik id zadania -> waga (słowa z tytułu liczą
+    się WAGA_TYTULU razy). Posortowana lista słów pozwala szukać po prefiksie.
+    Zmiany i wyszukiwanie idą pod jedną blokadą (wołane z puli wątków).
+    """
+
+    def __init__(self):
+        self._wpisy = {}
+        self._slowa_zadania = {}
+        self._slownik = []
+        self._blokada = threading.RLock()
+
+    def __len__(self):
+        return len(self._slowa_zadania)
+
+    def dodaj(self, zadanie):
+        """Zindeksuj zadanie; ponowne dodanie tego samego id zastępuje poprzedni wpis"""
+        wagi = Counter(tokeny(zadanie.opis))
+        for slowo in tokeny(zadanie.tytul):
+            wagi[slowo] += WAGA_TYTULU
+        with self._blokada:
+            if zadanie.id in self._slowa_zadania:
+                self.usun(zadanie.id)
+            for slowo, waga in wagi.items():
+                wpisy = self._wpisy.get(slowo)
+                if wpisy is None:
+                    wpisy = self._wpisy[slowo] = {}
+                    bisect.insort(self._slownik, slowo)
+                wpisy[zadanie.id] = waga
+            self._slowa_zadania[zadanie.id] = tuple(wagi)
+
+    def usun(self, id_zadania: int):
+        with self._blokada:
+            for slowo in self._slowa_zadania.pop(id_zadania, ()):
+                wpisy = self._wpisy[slowo]
+                del wpisy[id_zadania]
+                if not wpisy:
+                    del self._wpisy[slowo]
+                    del self._slownik[bisect.bisect_left(self._slownik, slowo)]
+
+    def _rozwin(self, prefiks: str) -> tuple:
+        """Słowa zaczynające się od prefiksu (najwyżej MAKS_ROZWINIEC) i czy jakieś pominięto"""
+        start = bisect.bisect_left(self._slownik, prefiks)
+        koniec = bisect.bisect_left(self._slownik, prefiks + "\uffff", start)
+        return self._slownik[start:min(koniec, start + MAKS_ROZWINIEC)], koniec - start > MAKS_ROZWINIEC
+
+    def szukaj(self, zapytanie: str, limit: int = 20) -> tuple:
+        """Id zadań pasujących do wszystkich słów zapytania, z oceną trafności, od najlepszego.
+
+        Każde słowo zapytania jest traktowane jako prefiks; dokładne
+        trafienie liczy się podwójnie, a rzadkie słowa ważą więcej (idf).
+        Zwraca (lista par (id, ocena), obcięte) - obcięte znaczy, że prefiks
+        pasował do więcej niż MAKS_ROZWINIEC słów i część trafień pominięto.
+        """
+        slowa = tokeny(zapytanie)
+        if not slowa or limit <= 0:
+            return [], False
+
+        with self._blokada:
+            rozwiniecia = []
+            obciete = False
+            for slowo in slowa:
+                pasujace, pominiete = self._rozwin(slowo)
+                if not pasujace:
+                    return [], False
+                obciete = obciete or pominiete
+                rozwiniecia.append((slowo, pasujace, sum(len(self._wpisy[p]) for p in pasujace)))
+
+            # przecięcie od najrzadszego słowa; "klucze & zbiór" przechodzi krótszą stronę
+            rozwiniecia.sort(key=lambda r: r[2])
+            kandydaci = set().union(*(self._wpisy[p].keys() for p in rozwiniecia[0][1]))
+            for _, pasujace, _ in rozwiniecia[1:]:
+                kandydaci = set().union(*(self._wpisy[p].keys() & kandydaci for p in pasujace))
+                if not kandydaci:
+                    return [], obciete
+
+            # oceny liczone tylko dla zadań z przecięcia
+            oceny = dict.fromkeys(kandydaci, 0.0)
+            for slowo, pasujace, _ in rozwiniecia:
+                for pasujace_slowo in pasujace:
+                    wpisy = self._wpisy[pasujace_slowo]
+                    mnoznik = (2.0 if pasujace_slowo == slowo else 1.0) * math.log(1 + len(self) / len(wpisy))
+                    for id_zadania in wpisy.keys() & kandydaci:
+                        oceny[id_zadania] += wpisy[id_zadania] * mnoznik
+
+        return heapq.nlargest(limit, oceny.items(), key=lambda para: (para[1], -para[0])), obciete
@@ -0,0 +1,81 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from graphql import GraphQLError
+from strawberry.extensions import SchemaExtension
+
+MAKS_ZAPYTAN = 1000
+
+
+class RejestrZapytan:
+    """Teksty zapytań GraphQL po skrócie sha256, ograniczone do MAKS_ZAPYTAN (LRU)"""
+
+    def __init__(self, maks_zapytan: int = MAKS_ZAPYTAN):
+        self.maks_zapytan = maks_zapytan
+        self._zapytania = OrderedDict()
+        self._blokada = threading.Lock()
+
+    def __len__(self):
+        return len(self._zapytania)
+
+    def pobierz(self, skrot: str):
+        with self._blokada:
+            zapytanie = self._zapytania.get(skrot)
+            if zapytanie is not None:
+                self._zapytania.move_to_end(skrot)
+            return zapytanie
+
+    def zarejestruj(self, skrot: str, zapytanie: str) -> str:
+        """Zapamiętaj zapytanie i zwróć zapamiętany obiekt str.
+
+        Ten sam obiekt przy kolejnych żądaniach ma już policzony hash, więc
+        wyszukanie go w pamięci podręcznej parsera nic nie kosztuje.
+        """
+        with self._blokada:
+            zapamietane = self._zapytania.setdefault(skrot, zapytanie)
+            self._zapytania.move_to_end(skrot)
+            while len(self._zapytania) > self.maks_zapytan:
+                self._zapytania.popitem(last=False)
+            return zapamietane
+
+
+def skrot_zapytania(zapytanie: str) -> str:
+    return hashlib.sha256(zapytanie.encode("utf-8")).hexdigest()
+
+
+def _blad(kod: str, wiadomosc: str) -> GraphQLError:
+    return GraphQLError(wiadomosc, extensions={"code": kod})
+
+
+class UtrwaloneZapytania(SchemaExtension):
+    """Automatic persisted queries w formacie Apollo.
+
+    Klient wysyła samo {"extensions": {"persistedQuery": {"version": 1,
+    "sha256Hash": "..."}}}. Jeśli serwer nie zna skrótu, odpowiada błędem
+    PERSISTED_QUERY_NOT_FOUND, a klient powtarza żądanie z pełnym tekstem
+    zapytania, który zostaje zarejestrowany. Sparsowane i zwalidowane
+    dokumenty trzymają ParserCache i ValidationCache schematu.
+    """
+
+    def __init__(self, rejestr: RejestrZapytan, *, execution_context=None):
+        self.rejestr = rejestr
+
+    def on_operation(self):
+        kontekst = self.execution_context
+        utrwalone = (kontekst.operation_extensions or {}).get("persistedQuery")
+        if utrwalone is not None:
+            if not isinstance(utrwalone, dict):
+                utrwalone = {}
+            skrot = utrwalone.get("sha256Hash")
+            if utrwalone.get("version") != 1 or not isinstance(skrot, str):
+                raise _blad("PERSISTED_QUERY_NOT_SUPPORTED", "Nieobsługiwana wersja persistedQuery")
+            if kontekst.query:
+                if skrot_zapytania(kontekst.query) != skrot:
+                    raise _blad("BAD_USER_INPUT", "provided sha does not match query")
+                kontekst.query = self.rejestr.zarejestruj(skrot, kontekst.query)
+            else:
+                kontekst.query = self.rejestr.pobierz(skrot)
+                if kontekst.query is None:
+                    raise _blad("PERSISTED_QUERY_NOT_FOUND", "PersistedQueryNotFound")
+        yield
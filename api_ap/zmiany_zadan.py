@@ -0,0 +1,119 @@
+import asyncio
+import threading
+from collections import deque
+
+ROZMIAR_BUFORA = 10_000
+ROZMIAR_KOLEJKI = 1000
+INTERWAL_PINGU = 15.0
+
+
+def _zdarzenie_sse(numer: int, rodzaj: str, dane: str) -> str:
+    return f"id: {numer}\nevent: {rodzaj}\ndata: {dane}\n\n"
+
+
+class _Subskrypcja:
+    __slots__ = ("kolejka", "przepelniona")
+
+    def __init__(self, rozmiar: int):
+        self.kolejka = asyncio.Queue(rozmiar)
+        self.przepelniona = False
+
+
+class KanalZmian:
+    """Publikacja zmian zadań do subskrybentów strumienia SSE, w obrębie jednego procesu.
+
+    opublikuj() może być wołane z dowolnego wątku (trasy synchroniczne działają
+    w puli wątków). Zdarzenia są od razu formatowane jako tekst SSE i trafiają
+    do bufora cyklicznego ostatnich ROZMIAR_BUFORA zdarzeń, z którego wznawia
+    się połączenie po Last-Event-ID. Do pętli asyncio trafia najwyżej jedno
+    call_soon_threadsafe na paczkę zdarzeń, niezależnie od liczby subskrybentów.
+
+    Subskrybent, który nie nadąża (pełna kolejka), jest rozłączany; po
+    ponownym połączeniu z Last-Event-ID dostaje zaległe zdarzenia z bufora.
+    """
+
+    def __init__(self, rozmiar_bufora: int = ROZMIAR_BUFORA, rozmiar_kolejki: int = ROZMIAR_KOLEJKI):
+        self.rozmiar_kolejki = rozmiar_kolejki
+        self._bufor = deque(maxlen=rozmiar_bufora)
+        self._ostatni_numer = 0
+        self._subskrypcje = set()
+        self._oczekujace = []
+        self._petla = None
+        self._blokada = threading.Lock()
+
+    def __len__(self):
+        return len(self._subskrypcje)
+
+    def opublikuj(self, rodzaj: str, zadanie):
+        """Obserwator repozytorium: funkcja(rodzaj, zadanie)"""
+        dane = zadanie.jako_json()
+        with self._blokada:
+            self._ostatni_numer += 1
+            zdarzenie = (self._ostatni_numer, _zdarzenie_sse(self._ostatni_numer, rodzaj, dane))
+            self._bufor.append(zdarzenie)
+            if not self._subskrypcje:
+                return
+            self._oczekujace.append(zdarzenie[1])
+            if len(self._oczekujace) > 1:
+                return  # rozesłanie już zaplanowane
+            petla = self._petla
+        try:
+            petla.call_soon_threadsafe(self._rozeslij)
+        except RuntimeError:
+            pass  # pętla zamknięta przy wyłączaniu serwera
+
+    def _rozeslij(self):
+        with self._blokada:
+            paczka, self._oczekujace = self._oczekujace, []
+            subskrypcje = list(self._subskrypcje)
+        for subskrypcja in subskrypcje:
+            if subskrypcja.przepelniona:
+                continue
+            kolejka = subskrypcja.kolejka
+            for tekst in paczka:
+                if kolejka.full():
+                    # zaległe zdarzenia i tak są w buforze - klient wznowi od ostatniego odebranego
+                    subskrypcja.przepelniona = True
+                    while not kolejka.empty():
+                        kolejka.get_nowait()
+                    kolejka.put_nowait(None)
+                    break
+                kolejka.put_nowait(tekst)
+
+    def _zalegle(self, ostatnie_id):
+        """Zdarzenia po ostatnie_id z bufora albo None, gdy bufor ich już nie ma"""
+        if ostatnie_id is None:
+            return []
+        if ostatnie_id > self._ostatni_numer:
+            return None  # id z poprzedniego uruchomienia serwera
+        if self._bufor and ostatnie_id < self._bufor[0][0] - 1:
+            return None
+        return [tekst for numer, tekst in self._bufor if numer > ostatnie_id]
+
+    async def strumien(self, ostatnie_id=None):
+        """Tekst SSE dla jednego klienta: zaległe zdarzenia, potem nowe, co jakiś czas ping"""
+        subskrypcja = _Subskrypcja(self.rozmiar_kolejki)
+        with self._blokada:
+            self._petla = asyncio.get_running_loop()
+            zalegle = self._zalegle(ostatnie_id)
+            numer = self._ostatni_numer
+            self._subskrypcje.add(subskrypcja)
+        try:
+            if zalegle is None:
+                # klient musi pobrać pełną listę od nowa
+                yield _zdarzenie_sse(numer, "reset", "{}")
+            else:
+                for tekst in zalegle:
+                    yield tekst
+            while True:
+                try:
+                    tekst = await asyncio.wait_for(subskrypcja.kolejka.get(), INTERWAL_PINGU)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if tekst is None:
+                    return
+                yield tekst
+        finally:
+            with self._blokada:
+                self._subskrypcje.discard(subskrypcja)